@@ -10,6 +10,42 @@ class Settings(BaseSettings):
 
     # APScheduler settings
     SCHEDULER_TIMEZONE: str = "UTC"
+    SCHEDULER_SEND_WORKERS: int = 16  # concurrent sends per scheduler tick
+    SCHEDULER_CATCHUP_MINUTES: int = 15  # how far back a late tick still delivers missed minutes
+    SCHEDULER_MEMBER_LEASE_SECONDS: int = 30  # a worker that misses this long is dropped and its users rebalanced
+    BOT_POLLING_ENABLED: bool = True  # extra scheduler-only workers set this to False; Telegram allows one poller
+    USER_CONTEXT_TTL_SECONDS: float = 30  # bot-side cache of the user loaded per update
+    TEMPLATE_CACHE_CHECK_SECONDS: float = 5  # how often a process checks whether templates were edited elsewhere
+    TEMPLATE_SNAPSHOT_PATH: Optional[str] = None  # JSON copy of all templates, used when MongoDB is unavailable at start
+    TEMPLATE_SYNC_TIMEOUT_MS: int = 5000  # sync template preload gives up on MongoDB after this
+    SEND_SLOT_RATE: float = 25  # scheduled sends per second planned for a crowded minute, below the global limit; split like it
+    SEND_SLOT_MAX_SPREAD_SECONDS: float = 120  # latest slot offset within a minute bucket
+    SCHEDULE_INDEX_POLL_SECONDS: float = 5.0  # notification change polling when change streams are unavailable
+    SCHEDULE_INDEX_RELOAD_MINUTES: int = 30  # full reload while polling, drops deleted notifications
+    CONVERSATION_TRANSITION_BATCH_SIZE: int = 100  # buffered transitions written with one insert_many
+    CONVERSATION_TRANSITION_FLUSH_SECONDS: float = 5.0
+    CONVERSATION_TRANSITION_MAX_PENDING: int = 10000  # oldest are dropped beyond this while MongoDB is down
+    METRICS_PORT: Optional[int] = None  # serve scheduler metrics on /metrics when set
+
+    # Scheduled training deliveries (see BotScheduler.send_scheduled_training_deliveries)
+    SCHEDULED_TRAINING_PREVIEW_CONCURRENCY: int = 4  # missing previews generated in parallel in the background
+    SCHEDULED_TRAINING_LEASE_SECONDS: int = 600  # a SENDING delivery is picked up again after this
+
+    # Outbox for outgoing bot messages (see app/outbox.py)
+    OUTBOX_WORKERS: int = 8
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_LEASE_SECONDS: int = 60  # a SENDING message is retried if not finished in time
+    OUTBOX_MAX_ATTEMPTS: int = 5  # then the message is dead-lettered
+    OUTBOX_RETRY_BASE_SECONDS: int = 5
+    OUTBOX_RETRY_MAX_SECONDS: int = 900
+
+    # Telegram outgoing rate limits (see app/utils/rate_limiter.py)
+    TELEGRAM_GLOBAL_RATE: float = 30  # messages per second across all chats, split between sharded scheduler workers
+    TELEGRAM_CHAT_RATE: float = 1  # messages per second to one private chat
+    TELEGRAM_CHAT_BURST: float = 3
+    TELEGRAM_GROUP_RATE_PER_MINUTE: float = 20
+    TELEGRAM_INTERACTIVE_WINDOW_SECONDS: float = 10  # bulk lanes hold back this long after a handler reply
+    TELEGRAM_MAX_RETRIES: int = 3
 
     # MongoDB settings
     # Connection details
@@ -31,6 +67,7 @@ class Settings(BaseSettings):
     MONGODB_MAX_POOL_SIZE: int = 100
     MONGODB_MIN_POOL_SIZE: int = 10
     MONGODB_MAX_IDLE_TIME_MS: int = 10000
+    DB_INDEX_AUDIT: bool = True  # explain() the hot queries at startup and log collection scans
 
     # OpenAI settings for AI Analysis
     OPENAI_API_KEY: Optional[str] = None
@@ -1,8 +1,11 @@
+import logging
 from typing import List, Type
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
 
 from app.config import settings
+from app.db.index_audit import audit_indexes
 from app.db.models import (
     User,
     ConversationTransition,
@@ -12,8 +15,17 @@ from app.db.models import (
     UserStatistics,
     TextTemplate,
     ScheduledTrainingDelivery,
+    OutboxMessage,
+    PaymentDaysRun,
+    SchedulerMember,
+    CacheVersion,
+    TrainingFileHistory,
+    TrainingPreview,
+    StatisticsBroadcastRun,
 )
 
+logger = logging.getLogger(__name__)
+
 
 async def init_db():
     """Initialize database connection and register document models"""
@@ -32,11 +44,34 @@ async def init_db():
         UserStatistics,
         TextTemplate,
         ScheduledTrainingDelivery,
+        OutboxMessage,
+        PaymentDaysRun,
+        SchedulerMember,
+        CacheVersion,
+        TrainingFileHistory,
+        TrainingPreview,
+        StatisticsBroadcastRun,
     ]
 
-    await init_beanie(
-        database=client[settings.MONGODB_DB_NAME], document_models=document_models
-    )
+    database = client[settings.MONGODB_DB_NAME]
+    try:
+        await init_beanie(database=database, document_models=document_models)
+    except OperationFailure as e:
+        # An index that can't be built, e.g. the unique telegram_id index while
+        # duplicate users exist (see dedupe_users.py), must not stop the bot
+        logger.error(f"[INDEX_AUDIT] Index creation failed, retrying per model: {e}")
+        for model in document_models:
+            try:
+                await init_beanie(database=database, document_models=[model])
+            except OperationFailure as model_error:
+                logger.error(
+                    f"[INDEX_AUDIT] Indexes of {model.__name__} not created: {model_error}"
+                )
+                await init_beanie(database=database, document_models=[model], skip_indexes=True)
 
     print(f"Connected to MongoDB: {settings.MONGODB_DB_NAME}")
+
+    if settings.DB_INDEX_AUDIT:
+        await audit_indexes()
+
     return client
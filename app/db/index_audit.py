@@ -0,0 +1,117 @@
+"""
+Startup audit of the hot queries.
+
+Each query in HOT_QUERIES is run through explain() and any plan that falls
+back to a collection scan is logged, so a missing or dropped index shows up
+in the bot and web logs right after deploy instead of as slow handlers.
+"""
+import logging
+from datetime import datetime
+from typing import Iterator, List
+
+from app.db.models import (
+    INDEX_SET_VERSION,
+    MorningQuiz,
+    Notification,
+    OutboxMessage,
+    ScheduledTrainingDelivery,
+    TrainingFileHistory,
+    TrainingPreview,
+    TrainingSession,
+    User,
+    UserStatistics,
+)
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(2024, 1, 1)
+
+# (name, document model, filter, sort) with values shaped like the real queries
+HOT_QUERIES = [
+    ("user_by_telegram_id", User, {"telegram_id": "0"}, None),
+    ("training_preview_by_user", TrainingPreview, {"user_id": "0"}, None),
+    ("training_file_history_by_user", TrainingFileHistory, {"user_id": "0"}, [("sent_at", -1)]),
+    (
+        "morning_quizzes_by_user_period",
+        MorningQuiz,
+        {"user_id": "0", "created_at": {"$gte": _EPOCH, "$lte": _EPOCH}},
+        [("created_at", -1)],
+    ),
+    (
+        "training_sessions_by_user_period",
+        TrainingSession,
+        {"user_id": "0", "created_at": {"$gte": _EPOCH, "$lte": _EPOCH}},
+        None,
+    ),
+    (
+        "due_daily_notifications",
+        Notification,
+        {"notification_type": "daily_morning_notification", "is_active": True, "notification_minute": {"$in": [480]}},
+        None,
+    ),
+    (
+        "due_custom_notifications",
+        Notification,
+        {"notification_type": "custom_notification", "is_active": True, "next_fire_at": {"$lte": _EPOCH}},
+        None,
+    ),
+    (
+        "user_statistics_by_period",
+        UserStatistics,
+        {"user_id": "0", "period_type": "weekly", "period_start": _EPOCH, "period_end": _EPOCH},
+        None,
+    ),
+    (
+        "outbox_due_messages",
+        OutboxMessage,
+        {"status": "pending", "next_attempt_at": {"$lte": _EPOCH}},
+        [("next_attempt_at", 1)],
+    ),
+    (
+        "due_scheduled_deliveries",
+        ScheduledTrainingDelivery,
+        {"status": "pending", "send_at": {"$lte": _EPOCH}},
+        [("send_at", 1)],
+    ),
+]
+
+
+def _plan_stages(plan) -> Iterator[str]:
+    """All stage names in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+async def audit_indexes() -> List[str]:
+    """Explain the hot queries and log those planned as collection scans; returns their names."""
+    collection_scans = []
+    for name, model, query, sort in HOT_QUERIES:
+        try:
+            cursor = model.get_motor_collection().find(query).limit(1)
+            if sort:
+                cursor = cursor.sort(sort)
+            explain = await cursor.explain()
+        except Exception as e:
+            logger.warning(f"[INDEX_AUDIT] Could not explain {name}: {e}")
+            continue
+        stages = set(_plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {})))
+        if "COLLSCAN" in stages:
+            collection_scans.append(name)
+            logger.warning(
+                f"[INDEX_AUDIT] {name} on {model.get_collection_name()} is a collection scan: {query}"
+            )
+
+    if collection_scans:
+        logger.warning(
+            f"[INDEX_AUDIT] Index set v{INDEX_SET_VERSION}: {len(collection_scans)} of "
+            f"{len(HOT_QUERIES)} hot queries scan collections"
+        )
+    else:
+        logger.info(f"[INDEX_AUDIT] Index set v{INDEX_SET_VERSION}: all {len(HOT_QUERIES)} hot queries use indexes")
+    return collection_scans
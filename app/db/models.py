@@ -1,21 +1,61 @@
-from datetime import datetime
-from typing import List, Optional
-from beanie import Document, Indexed
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+from croniter import croniter
+from beanie import (
+    Delete,
+    Document,
+    Indexed,
+    Insert,
+    Replace,
+    Save,
+    SaveChanges,
+    Update,
+    after_event,
+    before_event,
+)
 from pydantic import BaseModel, Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from enum import Enum
 
 
+# Bump when indexes below are added, changed or removed; init_db logs it with the index audit
+INDEX_SET_VERSION = 5
+
+
 class TrainingGoal(str, Enum):
     LOSE_WEIGHT = "Зниженя ваги"
     BUILD_MUSCLE = "Набір м'язової маси"
     MAINTAIN_FITNESS = "Підтримка форми"
 
 
-class TrainingFileHistory(BaseModel):
+class TrainingFileHistory(Document):
+    """One training file sent to (or removed from) a user, newest shown first on the profile page."""
+    user_id: str
     filename: str
     sent_at: datetime
     file_url: Optional[str] = None
 
+    class Settings:
+        name = "training_file_history"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("sent_at", DESCENDING)], name="user_sent_at"),
+        ]
+
+
+class TrainingPreview(Document):
+    """Generated HTML preview of a user's current training file, one per user."""
+    user_id: str
+    preview: Optional[str] = None
+    generated_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+    class Settings:
+        name = "training_previews"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], name="user_id", unique=True),
+        ]
+
 
 class User(Document):
     telegram_id: str
@@ -27,18 +67,91 @@ class User(Document):
     created_at: datetime = Field(default_factory=datetime.now)
     payed_days_left: int = 28 # 4 weeks -> default payment, -1 -> means unlimited
     paused_payment: bool = False
-    training_file_url: Optional[str] = None
-    training_preview: Optional[str] = None
-    training_preview_generated_at: Optional[datetime] = None
-    training_preview_error: Optional[str] = None
-    training_file_history: Optional[List[TrainingFileHistory]] = None
+    payed_days_updated_on: Optional[str] = None  # run_date of the last update_payment_days that counted this user
+    training_file_url: Optional[str] = None  # preview and history live in TrainingPreview / TrainingFileHistory
     
     # Timezone settings
     country: Optional[str] = "Україна"  # Country name
     timezone_offset: Optional[int] = 0  # Hours difference from Kyiv time (can be negative)
 
+    @after_event(Insert, Replace, Save, SaveChanges, Update, Delete)
+    def invalidate_user_context(self):
+        # Imported here: the cache module depends on this one
+        from app.utils.user_context import user_context_cache
+        user_context_cache.invalidate(self.telegram_id)
+
     class Settings:
         name = "users"
+        indexes = [
+            IndexModel([("telegram_id", ASCENDING)], name="telegram_id", unique=True),
+            IndexModel(
+                [("paused_payment", ASCENDING), ("payed_days_left", ASCENDING)],
+                name="paused_payment_days_left",
+            ),
+        ]
+
+
+class UserContext(BaseModel):
+    """Projection of User loaded once per bot update for filters and read-only handler checks."""
+    telegram_id: str
+    full_name: str
+    is_active: bool = True
+    is_verified: bool = False
+    training_goal: TrainingGoal = TrainingGoal.MAINTAIN_FITNESS
+    timezone_offset: Optional[int] = 0
+
+
+class UserPaymentStatus(BaseModel):
+    """Projection of User with only what the payment reminders need."""
+    telegram_id: str
+    full_name: str
+    telegram_username: str
+    payed_days_left: int
+
+
+class UserSummary(BaseModel):
+    """Projection of User for lists and bulk scans."""
+    telegram_id: str
+    full_name: str
+    telegram_username: str
+    is_active: bool = True
+    is_verified: bool = False
+    created_at: datetime = Field(default_factory=datetime.now)
+    payed_days_left: int = 28
+    paused_payment: bool = False
+    country: Optional[str] = "Україна"
+    timezone_offset: Optional[int] = 0
+
+
+class PaymentDaysRun(Document):
+    """Audit record of one daily update_payment_days run; run_date makes it run once per day."""
+    run_date: str  # YYYY-MM-DD in Kyiv time
+    started_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+    users_updated: Optional[int] = None
+    error: Optional[str] = None
+
+    class Settings:
+        name = "payment_days_runs"
+        indexes = [
+            IndexModel([("run_date", ASCENDING)], name="run_date", unique=True),
+        ]
+
+
+class SchedulerMember(Document):
+    """Lease of one bot worker taking part in sharded scheduling."""
+    member_id: str
+    hostname: Optional[str] = None
+    started_at: datetime = Field(default_factory=datetime.now)
+    lease_until: datetime
+
+    class Settings:
+        name = "scheduler_members"
+        indexes = [
+            IndexModel([("member_id", ASCENDING)], name="member_id", unique=True),
+            # Leases of crashed workers are purged long after they stopped counting
+            IndexModel([("lease_until", ASCENDING)], name="lease_until", expireAfterSeconds=3600),
+        ]
 
 
 class ConversationTransition(Document):
@@ -58,9 +171,37 @@ class NotificationType(str, Enum):
     GYM_REMINDER_NOTIFICATION = "gym_reminder_notification"
 
 
+KYIV_TZ = ZoneInfo("Europe/Kyiv")
+
+
+def next_cron_fire_at(cron_expr: Optional[str], after: datetime) -> Optional[datetime]:
+    """Next Kyiv-time fire instant of the cron expression strictly after `after`, or None if invalid."""
+    if not cron_expr:
+        return None
+    try:
+        return croniter(cron_expr, after).get_next(datetime)
+    except Exception:
+        return None
+
+
+def time_str_to_minute_of_day(time_str: Optional[str]) -> Optional[int]:
+    """Convert "HH:MM" to minutes since midnight, or None if it can't be parsed."""
+    if not time_str:
+        return None
+    try:
+        hours, minutes = map(int, time_str.split(":"))
+    except ValueError:
+        return None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        return None
+    return hours * 60 + minutes
+
+
 class Notification(Document):
     user_id: Indexed(str)
     notification_time: str  # Time in Kyiv timezone for scheduler
+    notification_minute: Optional[int] = None  # notification_time as minute of day, used by scheduler lookups
+    next_fire_at: Optional[datetime] = None  # custom notifications: next cron fire instant, advanced after each send
     notification_time_base: Optional[str] = None  # Original time in user's timezone (for display)
     notification_text: str
     notification_type: NotificationType
@@ -71,13 +212,45 @@ class Notification(Document):
 
     is_active: bool = True
     created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: Optional[datetime] = None  # set on every save, polled by the scheduler's schedule index
+
+    @before_event(Insert, Replace, Save, SaveChanges)
+    def sync_schedule_fields(self):
+        self.updated_at = datetime.now(KYIV_TZ)
+        self.notification_minute = time_str_to_minute_of_day(self.notification_time)
+        if self.notification_type == NotificationType.CUSTOM_NOTIFICATION:
+            # Start just before the current minute so an edit made at the fire minute still fires
+            current_minute = datetime.now(KYIV_TZ).replace(second=0, microsecond=0)
+            self.next_fire_at = next_cron_fire_at(
+                self.custom_notification_cron, current_minute - timedelta(seconds=1)
+            )
 
     class Settings:
         name = "notifications"
+        indexes = [
+            IndexModel(
+                [
+                    ("notification_type", ASCENDING),
+                    ("is_active", ASCENDING),
+                    ("notification_minute", ASCENDING),
+                ],
+                name="type_active_minute",
+            ),
+            IndexModel(
+                [
+                    ("notification_type", ASCENDING),
+                    ("is_active", ASCENDING),
+                    ("next_fire_at", ASCENDING),
+                ],
+                name="type_active_next_fire_at",
+            ),
+            IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        ]
 
 
 class ScheduledTrainingStatus(str, Enum):
     PENDING = "pending"
+    SENDING = "sending"
     SENT = "sent"
     FAILED = "failed"
     CANCELLED = "cancelled"
@@ -91,12 +264,61 @@ class ScheduledTrainingDelivery(Document):
     training_preview: Optional[str] = None
     training_filename: Optional[str] = None
     status: ScheduledTrainingStatus = ScheduledTrainingStatus.PENDING
+    locked_until: Optional[datetime] = None  # lease of the scheduler instance delivering it
     error_message: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
     sent_at: Optional[datetime] = None
 
     class Settings:
         name = "scheduled_training_deliveries"
+        indexes = [
+            IndexModel([("status", ASCENDING), ("send_at", ASCENDING)], name="status_send_at"),
+        ]
+
+
+class OutboxStatus(str, Enum):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+
+
+OUTBOX_RETENTION_SECONDS = 14 * 24 * 3600
+
+
+class OutboxMessage(Document):
+    idempotency_key: str  # one message per key, repeated enqueues are ignored
+    chat_id: str
+    text: str
+    reply_markup: Optional[dict] = None  # InlineKeyboardMarkup.model_dump()
+    parse_mode: Optional[str] = None
+    disable_web_page_preview: Optional[bool] = None
+    source: Optional[str] = None  # producer, e.g. scheduler job name
+
+    status: OutboxStatus = OutboxStatus.PENDING
+    attempts: int = 0
+    next_attempt_at: datetime
+    locked_until: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    sent_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None  # set when SENT or DEAD; the row expires after OUTBOX_RETENTION_SECONDS
+
+    class Settings:
+        name = "outbox_messages"
+        indexes = [
+            IndexModel([("idempotency_key", ASCENDING)], name="idempotency_key", unique=True),
+            IndexModel(
+                [("status", ASCENDING), ("next_attempt_at", ASCENDING)],
+                name="status_next_attempt",
+            ),
+            # Idempotency keys are per day or per one-off document, so two weeks of history is plenty
+            IndexModel(
+                [("finished_at", ASCENDING)],
+                name="finished_at",
+                expireAfterSeconds=OUTBOX_RETENTION_SECONDS,
+            ),
+        ]
 
 
 class MorningQuiz(Document):
@@ -113,6 +335,9 @@ class MorningQuiz(Document):
 
     class Settings:
         name = "morning_quizzes"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING)], name="user_created_at"),
+        ]
 
 
 class TrainingSession(Document):
@@ -137,6 +362,13 @@ class TrainingSession(Document):
 
     class Settings:
         name = "training_sessions"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING)], name="user_created_at"),
+            IndexModel(
+                [("user_id", ASCENDING), ("training_started_at", ASCENDING)],
+                name="user_training_started_at",
+            ),
+        ]
 
 
 class PeriodType(str, Enum):
@@ -144,6 +376,27 @@ class PeriodType(str, Enum):
     MONTHLY = "monthly"
 
 
+class StatisticsBroadcastRun(Document):
+    """One weekly or monthly statistics broadcast; (period_type, period_key) makes it run once per period."""
+    period_type: PeriodType
+    period_key: str  # Monday YYYY-MM-DD for weekly, YYYY-MM for monthly, Kyiv time
+    started_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+    messages_sent: Optional[int] = None
+    failures: Optional[int] = None
+    error: Optional[str] = None
+
+    class Settings:
+        name = "statistics_broadcast_runs"
+        indexes = [
+            IndexModel(
+                [("period_type", ASCENDING), ("period_key", ASCENDING)],
+                name="period_type_period_key",
+                unique=True,
+            ),
+        ]
+
+
 class UserStatistics(Document):
     user_id: Indexed(str)
     period_type: PeriodType
@@ -169,6 +422,17 @@ class UserStatistics(Document):
 
     class Settings:
         name = "user_statistics"
+        indexes = [
+            IndexModel(
+                [
+                    ("user_id", ASCENDING),
+                    ("period_type", ASCENDING),
+                    ("period_start", ASCENDING),
+                    ("period_end", ASCENDING),
+                ],
+                name="user_period",
+            ),
+        ]
 
 
 class TextTemplate(Document):
@@ -179,3 +443,16 @@ class TextTemplate(Document):
     
     class Settings:
         name = "text_templates"
+
+
+class CacheVersion(Document):
+    """Version counter of an in-process cache; bumping it invalidates the cache in every process."""
+    name: str
+    version: int = 0
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "cache_versions"
+        indexes = [
+            IndexModel([("name", ASCENDING)], name="name", unique=True),
+        ]
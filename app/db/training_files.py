@@ -0,0 +1,56 @@
+"""
+Training preview and file history of a user.
+
+Both are kept out of the User document so user lookups stay small; only the
+profile page and the preview handlers load them.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from app.db.models import TrainingFileHistory, TrainingPreview
+
+
+async def get_training_preview(user_id: str) -> Optional[TrainingPreview]:
+    return await TrainingPreview.find_one(TrainingPreview.user_id == str(user_id))
+
+
+async def set_training_preview(
+    user_id: str,
+    preview: Optional[str],
+    error: Optional[str] = None,
+    generated_at: Optional[datetime] = None,
+) -> None:
+    """Replace the user's preview; a failed generation stores only the error."""
+    await TrainingPreview.get_motor_collection().update_one(
+        {"user_id": str(user_id)},
+        {
+            "$set": {
+                "preview": preview,
+                "error": error,
+                "generated_at": (generated_at or datetime.now()) if preview else None,
+            }
+        },
+        upsert=True,
+    )
+
+
+async def clear_training_preview(user_id: str) -> None:
+    await TrainingPreview.find(TrainingPreview.user_id == str(user_id)).delete()
+
+
+async def add_training_file_history(
+    user_id: str, filename: str, file_url: Optional[str], sent_at: Optional[datetime] = None
+) -> None:
+    await TrainingFileHistory(
+        user_id=str(user_id),
+        filename=filename,
+        file_url=file_url,
+        sent_at=sent_at or datetime.now(),
+    ).insert()
+
+
+async def get_training_file_history(user_id: str) -> List[TrainingFileHistory]:
+    """The user's training files, newest first."""
+    return await TrainingFileHistory.find(
+        TrainingFileHistory.user_id == str(user_id)
+    ).sort([("sent_at", -1)]).to_list()
@@ -0,0 +1,31 @@
+"""
+Projected User queries for the bulk scans.
+
+Lists of users and scheduled jobs read only a few fields of each user, so
+these helpers fetch just the fields of the projection they return.
+"""
+from typing import Dict, List, Optional
+
+from app.db.models import User, UserSummary
+
+
+async def find_user_summaries(query: Optional[dict] = None, sort: Optional[list] = None) -> List[UserSummary]:
+    """UserSummary of every user matching the query."""
+    users = User.find(query or {}).project(UserSummary)
+    if sort:
+        users = users.sort(sort)
+    return await users.to_list()
+
+
+async def find_user_summary(telegram_id: str) -> Optional[UserSummary]:
+    return await User.find_one(User.telegram_id == str(telegram_id)).project(UserSummary)
+
+
+async def user_summaries_by_id(query: Optional[dict] = None) -> Dict[str, UserSummary]:
+    """UserSummary of every user matching the query, keyed by telegram_id."""
+    return {user.telegram_id: user for user in await find_user_summaries(query)}
+
+
+async def find_user_ids(query: Optional[dict] = None) -> List[str]:
+    """Telegram ids of the users matching the query, without loading documents."""
+    return await User.get_motor_collection().distinct("telegram_id", query or {})
@@ -0,0 +1,229 @@
+"""
+Mongo-backed outbox for outgoing bot messages.
+
+Producers (scheduler jobs) enqueue messages with an idempotency key; an
+OutboxWorker pool drains the collection, retrying failed sends with
+exponential backoff and dead-lettering messages that keep failing.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Union
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.types import InlineKeyboardMarkup
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.config import settings
+from app.db.models import OutboxMessage, OutboxStatus
+from app.utils.job_metrics import job_metrics
+from app.utils.rate_limiter import SendPriority, send_priority
+
+logger = logging.getLogger(__name__)
+
+# Errors that will not go away on retry (bot blocked, chat not found, bad markup)
+PERMANENT_ERRORS = (TelegramForbiddenError, TelegramBadRequest)
+
+# Set by OutboxWorker.start() so in-process producers wake idle workers immediately
+_wakeup: Optional[asyncio.Event] = None
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def enqueue_message(
+    chat_id: Union[int, str],
+    text: str,
+    *,
+    idempotency_key: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    parse_mode: Optional[str] = None,
+    disable_web_page_preview: Optional[bool] = None,
+    source: Optional[str] = None,
+    send_at: Optional[datetime] = None,
+) -> bool:
+    """
+    Queue a message for delivery.
+
+    Returns False if a message with the same idempotency key is already queued
+    or sent, so producers can safely retry their own enqueue.
+    """
+    message = OutboxMessage(
+        idempotency_key=idempotency_key,
+        chat_id=str(chat_id),
+        text=text,
+        reply_markup=reply_markup.model_dump(exclude_none=True) if reply_markup else None,
+        parse_mode=parse_mode,
+        disable_web_page_preview=disable_web_page_preview,
+        source=source,
+        next_attempt_at=send_at or utc_now(),
+    )
+    try:
+        await message.insert()
+    except DuplicateKeyError:
+        logger.debug(f"[OUTBOX] Message {idempotency_key} already queued")
+        return False
+
+    if _wakeup is not None:
+        _wakeup.set()
+    return True
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff after the given number of failed attempts."""
+    seconds = settings.OUTBOX_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1))
+    return timedelta(seconds=min(seconds, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+
+class OutboxWorker:
+    """Pool of asyncio workers that claim and send due outbox messages."""
+
+    def __init__(
+        self,
+        bot,
+        workers: int = settings.OUTBOX_WORKERS,
+        poll_interval: float = settings.OUTBOX_POLL_INTERVAL_SECONDS,
+        lease_seconds: int = settings.OUTBOX_LEASE_SECONDS,
+        max_attempts: int = settings.OUTBOX_MAX_ATTEMPTS,
+    ):
+        self.bot = bot
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        global _wakeup
+        if self._tasks:
+            return
+        _wakeup = asyncio.Event()
+        # Workers inherit the lane, so handler replies overtake queued messages
+        with send_priority(SendPriority.SCHEDULED):
+            self._tasks = [
+                asyncio.create_task(self._worker(), name=f"outbox-worker-{i}")
+                for i in range(self.workers)
+            ]
+        logger.info(f"[OUTBOX] Started {self.workers} workers")
+
+    def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def claim_next(self) -> Optional[OutboxMessage]:
+        """
+        Atomically take the oldest due message, or one whose lease expired
+        because the worker that held it died.
+        """
+        now = utc_now()
+        raw = await OutboxMessage.get_motor_collection().find_one_and_update(
+            {
+                "$or": [
+                    {"status": OutboxStatus.PENDING.value, "next_attempt_at": {"$lte": now}},
+                    {"status": OutboxStatus.SENDING.value, "locked_until": {"$lt": now}},
+                ]
+            },
+            {
+                "$set": {"status": OutboxStatus.SENDING.value, "locked_until": now + self.lease},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        return OutboxMessage.model_validate(raw) if raw else None
+
+    async def send(self, message: OutboxMessage) -> None:
+        # Unset options are left out so the bot's DefaultBotProperties (HTML) apply;
+        # an explicit None would turn them off
+        options = {}
+        if message.parse_mode is not None:
+            options["parse_mode"] = message.parse_mode
+        if message.disable_web_page_preview is not None:
+            options["disable_web_page_preview"] = message.disable_web_page_preview
+        await self.bot.send_message(
+            chat_id=message.chat_id,
+            text=message.text,
+            reply_markup=(
+                InlineKeyboardMarkup.model_validate(message.reply_markup)
+                if message.reply_markup
+                else None
+            ),
+            **options,
+        )
+
+    async def process(self, message: OutboxMessage) -> None:
+        try:
+            await self.send(message)
+        except Exception as e:
+            job_metrics.count("outbox", failures=1)
+            await self._handle_failure(message, e)
+            return
+
+        job_metrics.count("outbox", messages_sent=1)
+        await message.set(
+            {
+                OutboxMessage.status: OutboxStatus.SENT,
+                OutboxMessage.sent_at: utc_now(),
+                OutboxMessage.finished_at: utc_now(),
+                OutboxMessage.locked_until: None,
+                OutboxMessage.last_error: None,
+            }
+        )
+
+    async def _handle_failure(self, message: OutboxMessage, error: Exception) -> None:
+        if isinstance(error, PERMANENT_ERRORS) or message.attempts >= self.max_attempts:
+            logger.error(
+                f"[OUTBOX] Dead-lettering {message.idempotency_key} to {message.chat_id} "
+                f"after {message.attempts} attempt(s): {error}"
+            )
+            await message.set(
+                {
+                    OutboxMessage.status: OutboxStatus.DEAD,
+                    OutboxMessage.finished_at: utc_now(),
+                    OutboxMessage.locked_until: None,
+                    OutboxMessage.last_error: str(error),
+                }
+            )
+            return
+
+        delay = retry_delay(message.attempts)
+        logger.warning(
+            f"[OUTBOX] Send of {message.idempotency_key} to {message.chat_id} failed "
+            f"(attempt {message.attempts}), retrying in {delay.total_seconds():.0f}s: {error}"
+        )
+        await message.set(
+            {
+                OutboxMessage.status: OutboxStatus.PENDING,
+                OutboxMessage.next_attempt_at: utc_now() + delay,
+                OutboxMessage.locked_until: None,
+                OutboxMessage.last_error: str(error),
+            }
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                message = await self.claim_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("[OUTBOX] Failed to claim next message")
+                message = None
+
+            if message is not None:
+                try:
+                    await self.process(message)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception(f"[OUTBOX] Failed to process {message.idempotency_key}")
+                continue
+
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
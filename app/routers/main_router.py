@@ -14,8 +14,8 @@ from aiogram.types import (
     ReplyKeyboardMarkup,
     KeyboardButton,
 )
-from typing import Optional
-from app.db.models import User, Notification, NotificationType, MorningQuiz, TrainingGoal
+from typing import Optional, Union
+from app.db.models import User, UserContext, Notification, NotificationType, MorningQuiz, TrainingGoal
 from app.keyboards import get_main_menu_keyboard, get_notifications_menu_keyboard, get_report_problem_keyboard
 import app.text_constants as tc
 from app.states import MorningQuizStates
@@ -248,11 +248,12 @@ async def _get_or_create_user(message: Message) -> User:
 
 
 async def ensure_onboarding_not_finished(
-    message: Message, state: FSMContext, user: Optional[User] = None
+    message: Message, state: FSMContext, user: Optional[Union[User, UserContext]] = None
 ) -> bool:
     """
     Ensure the user finishes onboarding before accessing other menus.
     Returns True if we redirected the user to the pending question.
+    Only reads the user, so the UserContext injected by the middleware will do.
     """
     user = user or await _get_or_create_user(message)
 
@@ -295,11 +296,11 @@ async def ensure_onboarding_not_finished(
 
 
 @main_router.message(Command("start"))
-async def cmd_start(message: Message, state: FSMContext) -> None:
-
-    user_telegram_id = message.from_user.id
+async def cmd_start(
+    message: Message, state: FSMContext, user_context: Optional[UserContext] = None
+) -> None:
 
-    user = await User.find_one(User.telegram_id == str(user_telegram_id))
+    user = user_context
     if user and user.is_verified:
 
         if await ensure_onboarding_not_finished(message, state, user):
@@ -322,15 +323,14 @@ async def cmd_start(message: Message, state: FSMContext) -> None:
 
 
 @main_router.message(Command("menu"))
-async def cmd_menu(message: Message, state: FSMContext) -> None:
+async def cmd_menu(
+    message: Message, state: FSMContext, user_context: Optional[UserContext] = None
+) -> None:
     """
     Universal command to return to main menu from any state
     """
-    user_telegram_id = message.from_user.id
-    user = await User.find_one(User.telegram_id == str(user_telegram_id))
-    
     # Only verified users can use this command; otherwise continue onboarding
-    if await ensure_onboarding_not_finished(message, state, user):
+    if await ensure_onboarding_not_finished(message, state, user_context):
         return
     
     # Return to main menu
@@ -576,14 +576,17 @@ async def cmd_morning_quiz_test(message: Message, state: FSMContext) -> None:
 
 
 @main_router.message(StateFilter(MainMenuState.main_menu), ~F.text.regexp(r"^/"))
-async def process_main_menu(message: Message, state: FSMContext) -> None:
+async def process_main_menu(
+    message: Message, state: FSMContext, user_context: Optional[UserContext] = None
+) -> None:
 
-    if await ensure_onboarding_not_finished(message, state):
+    if await ensure_onboarding_not_finished(message, state, user_context):
         return
 
     active_quiz = await get_active_morning_quiz_for_today(
         message.from_user.id,
         is_test=None,
+        user=user_context,
     )
     if active_quiz:
         await state.update_data(morning_quiz_id=str(active_quiz.id))
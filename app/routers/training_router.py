@@ -12,6 +12,7 @@ import app.text_constants as tc
 from app.routers.main_router import MainMenuState
 from app.states import TrainingState, AfterTrainingState
 from app.db.models import TrainingSession, Notification, User, NotificationType
+from app.db.training_files import get_training_preview
 from app.keyboards import get_main_menu_keyboard
 from app.config import settings
 import datetime
@@ -746,9 +747,10 @@ async def preview_training(callback_query: CallbackQuery) -> None:
         await send_with_menu("❌ Тренування не знайдено. Зверніться до тренера.")
         return
 
-    if not user.training_preview:
+    training_preview = await get_training_preview(user.telegram_id)
+    if not training_preview or not training_preview.preview:
         message = "❌ Превʼю тренування поки що відсутнє. Зверніться до тренера."
-        if user.training_preview_error:
+        if training_preview and training_preview.error:
             message = (
                 "❌ Не вдалося згенерувати превʼю тренування. "
                 "Зверніться до тренера, щоб оновити файл."
@@ -757,7 +759,7 @@ async def preview_training(callback_query: CallbackQuery) -> None:
         await send_with_menu(message)
         return
 
-    preview_text = _prepare_preview_for_telegram(user.training_preview)
+    preview_text = _prepare_preview_for_telegram(training_preview.preview)
     await send_with_menu(
         f"🏋️ Превʼю твого тренування:\n\n{preview_text}",
         parse_mode="HTML",
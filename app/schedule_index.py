@@ -0,0 +1,299 @@
+"""
+In-memory index of upcoming notification fire instants.
+
+BotScheduler loads every active Notification once at startup and keeps one
+min-heap per notification type, keyed by the next fire instant in UTC. Each
+tick pops what is due and fetches only those documents by _id, so an idle
+minute costs no database queries at all.
+
+The index follows writes made by the bot routers and the web app through a
+Mongo change stream. Standalone servers don't support change streams, so
+there it falls back to polling `updated_at` and reloads periodically to
+forget deleted documents. Stale entries are harmless: stages re-check every
+fetched document and claim it atomically before sending.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time as dt_time, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from app.config import settings
+from app.db.models import KYIV_TZ, Notification, NotificationType, next_cron_fire_at
+
+logger = logging.getLogger(__name__)
+
+PROJECTION = {
+    "user_id": 1,
+    "notification_type": 1,
+    "is_active": 1,
+    "notification_minute": 1,
+    "next_fire_at": 1,
+    "custom_notification_cron": 1,
+    "custom_notification_execute_once": 1,
+    "updated_at": 1,
+}
+
+
+def as_utc(moment: datetime) -> datetime:
+    """Mongo returns naive UTC datetimes."""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def next_minute_fire_at(minute: int, after: datetime) -> datetime:
+    """Next instant strictly after `after` when the Kyiv clock shows the given minute of day."""
+    local_after = after.astimezone(KYIV_TZ)
+    fire_at = datetime.combine(
+        local_after.date(), dt_time(minute // 60, minute % 60), tzinfo=KYIV_TZ
+    )
+    if fire_at <= local_after:
+        fire_at = datetime.combine(
+            local_after.date() + timedelta(days=1), dt_time(minute // 60, minute % 60), tzinfo=KYIV_TZ
+        )
+    return fire_at.astimezone(timezone.utc)
+
+
+@dataclass
+class ScheduleEntry:
+    notification_type: NotificationType
+    fire_at: datetime  # UTC
+    minute: Optional[int] = None
+    cron: Optional[str] = None
+    execute_once: bool = False
+
+    def next_after(self, moment: datetime) -> Optional[datetime]:
+        if self.notification_type == NotificationType.CUSTOM_NOTIFICATION:
+            if self.execute_once or not self.cron:
+                return None
+            fire_at = next_cron_fire_at(self.cron, moment.astimezone(KYIV_TZ))
+            return as_utc(fire_at) if fire_at else None
+        return next_minute_fire_at(self.minute, moment)
+
+
+class ScheduleIndex:
+    def __init__(
+        self,
+        poll_interval: float = settings.SCHEDULE_INDEX_POLL_SECONDS,
+        reload_minutes: int = settings.SCHEDULE_INDEX_RELOAD_MINUTES,
+        catchup_minutes: int = settings.SCHEDULER_CATCHUP_MINUTES,
+        owns: Optional[Callable[[str], bool]] = None,
+    ):
+        self.owns = owns  # shard filter on user_id when several workers share the work
+        self.poll_interval = poll_interval
+        self.reload_interval = timedelta(minutes=reload_minutes)
+        self.catchup = timedelta(minutes=catchup_minutes)
+        self._entries: Dict[ObjectId, ScheduleEntry] = {}
+        self._heaps: Dict[NotificationType, list] = {t: [] for t in NotificationType}
+        self._seq = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self.mode: Optional[str] = None  # "change_stream" or "polling" once syncing
+        self.loaded_at: Optional[datetime] = None
+        self._popped_until: Optional[datetime] = None
+        # Fire instants handed out by the last pop_due of each type, kept until the stage fetched them
+        self._last_popped: Dict[NotificationType, List[tuple]] = {t: [] for t in NotificationType}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _seed_after(self, now: datetime) -> datetime:
+        """
+        Daily notifications are (re)indexed from the last popped instant, so a
+        document changed between the minute boundary and the tick isn't pushed
+        to tomorrow. Before the first tick that is the catch-up horizon, so
+        minutes missed during a restart still fire; per-day claims keep a
+        repeated fire from sending twice.
+        """
+        return self._popped_until or now - self.catchup
+
+    def _entry_from_raw(self, raw: dict, after: datetime) -> Optional[ScheduleEntry]:
+        if not raw.get("is_active", True):
+            return None
+        if self.owns is not None and not self.owns(raw.get("user_id")):
+            return None
+        try:
+            notification_type = NotificationType(raw.get("notification_type"))
+        except ValueError:
+            return None
+
+        if notification_type == NotificationType.CUSTOM_NOTIFICATION:
+            if not raw.get("next_fire_at"):
+                return None
+            return ScheduleEntry(
+                notification_type,
+                as_utc(raw["next_fire_at"]),
+                cron=raw.get("custom_notification_cron"),
+                execute_once=bool(raw.get("custom_notification_execute_once")),
+            )
+
+        minute = raw.get("notification_minute")
+        if minute is None:
+            return None
+        return ScheduleEntry(notification_type, next_minute_fire_at(minute, after), minute=minute)
+
+    def _push(self, notification_id: ObjectId, entry: ScheduleEntry) -> None:
+        self._entries[notification_id] = entry
+        heapq.heappush(
+            self._heaps[entry.notification_type], (entry.fire_at, next(self._seq), notification_id)
+        )
+
+    def upsert(self, raw: dict) -> None:
+        """(Re)index one notification document; inactive or unschedulable ones are dropped."""
+        entry = self._entry_from_raw(raw, self._seed_after(datetime.now(timezone.utc)))
+        if entry is None:
+            self.remove(raw["_id"])
+        else:
+            self._push(raw["_id"], entry)
+
+    def remove(self, notification_id: ObjectId) -> None:
+        # Heap items are dropped lazily when popped
+        self._entries.pop(notification_id, None)
+
+    async def load(self, now: Optional[datetime] = None, catch_up: bool = False) -> None:
+        """
+        Rebuild the index from all active notifications with one projected query.
+        `catch_up` seeds from the catch-up horizon, for notifications just taken
+        over from a worker that may have died before sending them.
+        """
+        now = now or datetime.now(timezone.utc)
+        after = now - self.catchup if catch_up else self._seed_after(now)
+        entries = {}
+        cursor = Notification.get_motor_collection().find({"is_active": True}, PROJECTION)
+        async for raw in cursor:
+            entry = self._entry_from_raw(raw, after)
+            if entry is not None:
+                entries[raw["_id"]] = entry
+
+        self._entries = {}
+        self._heaps = {t: [] for t in NotificationType}
+        for notification_id, entry in entries.items():
+            self._push(notification_id, entry)
+        self.loaded_at = now
+        logger.info(f"[SCHEDULE_INDEX] Loaded {len(self._entries)} active notifications")
+
+    def pop_due(self, notification_type: NotificationType, now: datetime) -> List[ObjectId]:
+        """Ids of notifications of the type due at or before `now`; each is rescheduled to its next fire."""
+        heap = self._heaps[notification_type]
+        now = as_utc(now)
+        self._popped_until = max(self._popped_until or now, now)
+        due = []
+        popped = []
+        while heap and heap[0][0] <= now:
+            fire_at, _, notification_id = heapq.heappop(heap)
+            entry = self._entries.get(notification_id)
+            if entry is None or entry.fire_at != fire_at or entry.notification_type != notification_type:
+                continue  # superseded or removed
+            due.append(notification_id)
+            popped.append((notification_id, fire_at, entry))
+            next_fire_at = entry.next_after(now)
+            if next_fire_at is None:
+                del self._entries[notification_id]
+            else:
+                entry.fire_at = next_fire_at
+                heapq.heappush(heap, (next_fire_at, next(self._seq), notification_id))
+        self._last_popped[notification_type] = popped
+        return due
+
+    def restore(self, notification_type: NotificationType) -> None:
+        """
+        Put back what the last pop_due of the type handed out, at the instants
+        it was due, so the next tick retries them; for a stage that failed
+        before it could fetch and claim them.
+        """
+        popped, self._last_popped[notification_type] = self._last_popped[notification_type], []
+        for notification_id, fire_at, entry in popped:
+            if self._entries.get(notification_id) not in (None, entry):
+                continue  # re-indexed since, the newer entry wins
+            entry.fire_at = fire_at
+            self._push(notification_id, entry)
+        if popped:
+            # A reload before the retry must seed from before them too
+            earliest = min(fire_at for _, fire_at, _ in popped) - timedelta(seconds=1)
+            self._popped_until = min(self._popped_until, earliest)
+
+    def next_fire_at(self) -> Optional[datetime]:
+        upcoming = [heap[0][0] for heap in self._heaps.values() if heap]
+        return min(upcoming) if upcoming else None
+
+    def status(self) -> dict:
+        next_fire_at = self.next_fire_at()
+        return {
+            "mode": self.mode,
+            "entries": len(self._entries),
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "next_fire_at": next_fire_at.isoformat() if next_fire_at else None,
+        }
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync(), name="schedule-index-sync")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sync(self) -> None:
+        while True:
+            try:
+                await self._watch()
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                logger.info(f"[SCHEDULE_INDEX] Change streams unavailable ({e}), polling updated_at instead")
+                await self._poll()
+            except Exception:
+                logger.exception("[SCHEDULE_INDEX] Change stream failed, reloading")
+                await asyncio.sleep(self.poll_interval)
+                # Changes made while the stream was down are picked up by the reload
+                await self._reload_safely()
+
+    async def _watch(self) -> None:
+        collection = Notification.get_motor_collection()
+        async with collection.watch(full_document="updateLookup") as stream:
+            self.mode = "change_stream"
+            async for change in stream:
+                notification_id = change["documentKey"]["_id"]
+                if change["operationType"] == "delete":
+                    self.remove(notification_id)
+                elif change["operationType"] in ("insert", "update", "replace"):
+                    full_document = change.get("fullDocument")
+                    if full_document is None:
+                        self.remove(notification_id)
+                    else:
+                        self.upsert(full_document)
+
+    async def _poll(self) -> None:
+        self.mode = "polling"
+        collection = Notification.get_motor_collection()
+        last_seen = self.loaded_at or datetime.now(timezone.utc)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            now = datetime.now(timezone.utc)
+            if self.loaded_at is None or now - self.loaded_at >= self.reload_interval:
+                await self._reload_safely()
+                last_seen = self.loaded_at or last_seen
+                continue
+            try:
+                # $gte: documents saved in the same millisecond as the last one seen are re-read, not lost
+                async for raw in collection.find({"updated_at": {"$gte": last_seen}}, PROJECTION):
+                    self.upsert(raw)
+                    last_seen = max(last_seen, as_utc(raw["updated_at"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("[SCHEDULE_INDEX] Failed to poll notification changes")
+
+    async def _reload_safely(self) -> None:
+        try:
+            await self.load()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("[SCHEDULE_INDEX] Failed to reload notifications")
@@ -1,5 +1,6 @@
 import asyncio
-from datetime import datetime, timedelta, date
+import time
+from datetime import datetime, timedelta, date, timezone
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.jobstores.mongodb import MongoDBJobStore
 from apscheduler.executors.asyncio import AsyncIOExecutor
@@ -11,17 +12,29 @@ from app.db.models import (
     User,
     MorningQuiz,
     TrainingSession,
-    TrainingFileHistory,
     ScheduledTrainingDelivery,
     ScheduledTrainingStatus,
+    PaymentDaysRun,
+    UserPaymentStatus,
+    next_cron_fire_at,
 )
 from app.utils.training_preview import generate_training_preview_from_pdf
+from app.db.training_files import add_training_file_history, get_training_preview, set_training_preview
 from pathlib import Path
 from app.statistics_scheduler import statistics_scheduler
 from zoneinfo import ZoneInfo
-from croniter import croniter
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import logging
 from app.utils.text_templates import get_template
+from app.utils.send_dispatcher import SendDispatcher
+from app.utils.send_slots import SendSlotPlanner
+from app.utils.rate_limiter import telegram_rate_limiter
+from app.outbox import OutboxWorker, enqueue_message
+from app.schedule_index import ScheduleIndex
+from app.scheduler_membership import SchedulerMembership
+from app.utils.job_metrics import job_metrics
+from functools import partial
 
 # Налаштовуємо логування - вимикаємо докладні логи MongoDB
 logging.basicConfig(level=logging.DEBUG)
@@ -44,6 +57,132 @@ jobstores = {
 }
 
 
+# payed_days_left -> tail of the admin digest line
+PAYMENT_REMINDER_MESSAGES = {
+    0: "закінчився платний період.",
+    1: "залишився 1 день платного періоду.",
+    7: "залишився 1 тиждень платного періоду.",
+}
+
+TELEGRAM_MESSAGE_LIMIT = 4000
+
+
+def split_message_lines(lines, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Join lines into as few messages as fit under Telegram's length limit."""
+    chunks, current = [], ""
+    for line in lines:
+        if current and len(current) + len(line) + 1 > limit:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def minute_of_day(moment: datetime) -> int:
+    """Minute of day used as the indexed due key on notifications."""
+    return moment.hour * 60 + moment.minute
+
+
+def minutes_in_window(start: datetime, end: datetime) -> list:
+    """Minutes of day whose start falls in (start, end], oldest first."""
+    minute = start.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    minutes = []
+    while minute <= end:
+        minutes.append(minute_of_day(minute))
+        minute += timedelta(minutes=1)
+    return minutes
+
+
+async def claim_notification_for_today(notification: Notification, now: datetime) -> bool:
+    """
+    Atomically mark the notification as sent today.
+
+    Returns False if it was already claimed today by another tick or bot
+    instance, so only the caller that gets True may send the message.
+    """
+    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    # Mongo keeps millisecond precision; drop microseconds so the release can match exactly
+    claimed_at = now.replace(microsecond=0)
+    claimed = await Notification.get_motor_collection().find_one_and_update(
+        {
+            "_id": notification.id,
+            "is_active": True,
+            "system_data.last_sent_date": {"$not": {"$gte": start_of_day}},
+        },
+        [{"$set": {"system_data": {"$mergeObjects": ["$system_data", {"last_sent_date": claimed_at}]}}}],
+        projection={"_id": 1},
+    )
+    return claimed is not None
+
+
+async def release_notification_claim(notification: Notification, now: datetime) -> None:
+    """Undo claim_notification_for_today after a failed send."""
+    previous = (notification.system_data or {}).get("last_sent_date")
+    await Notification.get_motor_collection().update_one(
+        {"_id": notification.id, "system_data.last_sent_date": now.replace(microsecond=0)},
+        {"$set": {"system_data.last_sent_date": previous}},
+    )
+
+
+async def claim_scheduled_delivery(now: datetime, lease: timedelta, skip_ids=()):
+    """
+    Atomically move one due delivery from PENDING to SENDING, or take over one
+    whose lease expired because the instance delivering it died. `skip_ids`
+    are deliveries this instance is still working on.
+    """
+    raw = await ScheduledTrainingDelivery.get_motor_collection().find_one_and_update(
+        {
+            "_id": {"$nin": list(skip_ids)},
+            "$or": [
+                {"status": ScheduledTrainingStatus.PENDING.value, "send_at": {"$lte": now}},
+                {"status": ScheduledTrainingStatus.SENDING.value, "locked_until": {"$lt": now}},
+            ],
+        },
+        {
+            "$set": {
+                "status": ScheduledTrainingStatus.SENDING.value,
+                "locked_until": now + lease,
+            }
+        },
+        sort=[("send_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+    return ScheduledTrainingDelivery.model_validate(raw) if raw else None
+
+
+def _held_lease(scheduled: ScheduledTrainingDelivery) -> dict:
+    """Filter matching the delivery only while it is still under the lease `scheduled` holds."""
+    return {
+        "_id": scheduled.id,
+        "status": ScheduledTrainingStatus.SENDING.value,
+        "locked_until": scheduled.locked_until,
+    }
+
+
+async def renew_scheduled_delivery_lease(scheduled: ScheduledTrainingDelivery, now: datetime, lease: timedelta) -> bool:
+    """Extend the held lease; False if it expired and another instance took the delivery over."""
+    raw = await ScheduledTrainingDelivery.get_motor_collection().find_one_and_update(
+        _held_lease(scheduled),
+        {"$set": {"locked_until": now + lease}},
+        projection={"locked_until": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if raw is None:
+        return False
+    scheduled.locked_until = raw["locked_until"]
+    return True
+
+
+async def finish_scheduled_delivery(scheduled: ScheduledTrainingDelivery, fields: dict) -> bool:
+    """Set the final status fields, only if the held lease is still ours."""
+    result = await ScheduledTrainingDelivery.get_motor_collection().update_one(
+        _held_lease(scheduled), {"$set": fields}
+    )
+    return result.modified_count == 1
+
+
 class BotScheduler:
     def __init__(self, bot, db_client):
         self.bot = bot
@@ -52,6 +191,17 @@ class BotScheduler:
             jobstores=jobstores,
             timezone="Europe/Kyiv",
         )
+        self.dispatcher = SendDispatcher(settings.SCHEDULER_SEND_WORKERS)
+        self.outbox = OutboxWorker(bot)
+        self.send_slots = SendSlotPlanner()
+        self._preview_semaphore = asyncio.Semaphore(settings.SCHEDULED_TRAINING_PREVIEW_CONCURRENCY)
+        self._preview_tasks = {}  # delivery id -> task generating its preview
+        self._deliveries_in_flight = set()
+        self.membership = SchedulerMembership(on_rebalance=self._rebalance)
+        self.schedule_index = ScheduleIndex(owns=self.membership.owns)
+        self.last_tick = None
+        job_metrics.listen(self.scheduler)
+        job_metrics.set_interval("scheduler_tick", 60)
         self._running = False
 
     async def start(self):
@@ -60,6 +210,13 @@ class BotScheduler:
             return
 
         try:
+            self.dispatcher.start()
+            self.outbox.start()
+            await self.membership.start()
+            self._apply_shard_rates()
+            await self.schedule_index.load()
+            self.schedule_index.start()
+
             # Add your jobs before starting
             await self.add_jobs()
 
@@ -80,18 +237,12 @@ class BotScheduler:
         """Add all scheduled jobs"""
         try:
             self.scheduler.add_job(
-                self.send_morning_notifications,
-                "interval",
-                minutes=1,
-                id="morning_notifications",
-                replace_existing=True,
-            )
-
-            self.scheduler.add_job(
-                self.send_after_training_notification,
-                "interval",
-                minutes=1,
-                id="after_training_notification",
+                self.tick,
+                "cron",
+                second=0,
+                id="scheduler_tick",
+                max_instances=1,
+                coalesce=True,
                 replace_existing=True,
             )
 
@@ -112,44 +263,160 @@ class BotScheduler:
                 replace_existing=True,
             )
 
-            self.scheduler.add_job(
-                self.send_too_long_training_notification,
-                "interval",
-                minutes=1,
-                id="too_long_training_notification",
-                replace_existing=True,
-            )
+            print("All scheduled jobs added successfully")
 
-            self.scheduler.add_job(
-                self.send_custom_notifications,
-                "interval",
-                minutes=1,
-                id="custom_notifications",
-                replace_existing=True,
-            )
+        except Exception as e:
+            print(f"Failed to add jobs: {e}")
+            raise
 
-            self.scheduler.add_job(
-                self.send_gym_reminder_notifications,
-                "interval",
-                minutes=1,
-                id="send_gym_reminder_notifications",
-                replace_existing=True,
-            )
+    def tick_stages(self):
+        """Per-minute stages run by tick(), keyed by stage name."""
+        stages = [
+            self.send_morning_notifications,
+            self.send_after_training_notification,
+            self.send_too_long_training_notification,
+            self.send_custom_notifications,
+            self.send_gym_reminder_notifications,
+            self.send_scheduled_training_deliveries,
+        ]
+        return {stage.__name__: stage for stage in stages}
+
+    # Stages that plan send slots, in the order their sends are laid out in a minute
+    SLOT_PLANNED_STAGES = (
+        "send_morning_notifications",
+        "send_after_training_notification",
+        "send_custom_notifications",
+        "send_gym_reminder_notifications",
+    )
+
+    async def tick(self):
+        """
+        Run every per-minute stage against one consistent "now".
 
-            self.scheduler.add_job(
-                self.send_scheduled_training_deliveries,
-                "interval",
-                minutes=1,
-                id="send_scheduled_training_deliveries",
-                replace_existing=True,
-            )
+        Stages query their due work in parallel and feed the shared send
+        dispatcher; per-stage timings are logged and kept in last_tick.
+        """
+        now = datetime.now(tz=zone_info)
+        tick_started = time.perf_counter()
+        self.send_slots.open_round(now, self.SLOT_PLANNED_STAGES)
 
-            print("All scheduled jobs added successfully")
+        async def run_stage(name, stage):
+            stage_started = time.perf_counter()
+            failed = False
+            try:
+                await stage(now)
+            except Exception:
+                failed = True
+                logger.exception(f"[TICK] Stage {name} failed")
+            finally:
+                self.send_slots.close_stage(now, name)
+            duration = time.perf_counter() - stage_started
+            job_metrics.observe_run(name, duration, failed=failed)
+            return name, duration
+
+        timings = dict(
+            await asyncio.gather(*(run_stage(name, stage) for name, stage in self.tick_stages().items()))
+        )
+        duration = time.perf_counter() - tick_started
+        self.last_tick = {
+            "at": now.isoformat(),
+            "duration_seconds": round(duration, 3),
+            "stages": {name: round(seconds, 3) for name, seconds in timings.items()},
+        }
+        logger.info(
+            f"[TICK] {now:%H:%M} finished in {duration:.2f}s ("
+            + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items())
+            + ")"
+        )
 
-        except Exception as e:
-            print(f"Failed to add jobs: {e}")
+    async def _rebalance(self):
+        """Workers joined or left: re-index the users this worker now owns."""
+        self._apply_shard_rates()
+        await self.schedule_index.load(catch_up=True)
+
+    def _apply_shard_rates(self):
+        """Split the bot-wide send rates between the workers, so together they stay within Telegram's limit."""
+        shard_count = self.membership.shard_count
+        telegram_rate_limiter.global_bucket.set_rate(settings.TELEGRAM_GLOBAL_RATE / shard_count)
+        self.send_slots.rate = settings.SEND_SLOT_RATE / shard_count
+
+    async def _due_notifications(self, notification_type, now, extra_filter=None):
+        """
+        Active notifications of the type that the schedule index reports due.
+        Only the popped ids are fetched, so a quiet minute makes no query.
+        Daily types are re-checked against the catch-up window in case the
+        index is behind an edit.
+        """
+        ids = self.schedule_index.pop_due(notification_type, now)
+        if not ids:
+            return []
+        query = {
+            "_id": {"$in": ids},
+            "notification_type": notification_type.value,
+            "is_active": True,
+        }
+        if extra_filter is None:
+            horizon = now - timedelta(minutes=settings.SCHEDULER_CATCHUP_MINUTES)
+            extra_filter = {"notification_minute": {"$in": minutes_in_window(horizon, now)}}
+        query.update(extra_filter)
+        try:
+            return await Notification.find(query).to_list()
+        except Exception:
+            # Nothing was claimed: keep them due instead of moving them to their next fire
+            self.schedule_index.restore(notification_type)
             raise
 
+    async def _dispatch(self, job_name, process, items):
+        """
+        Run `process(item)` for every item on the send dispatcher and log failures.
+        `process` returns True when it queued a message, which is counted as sent.
+        """
+        results = await self.dispatcher.run_all(partial(process, item) for item in items)
+        failures = 0
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                failures += 1
+                logger.error(f"[{job_name}] Failed to process {item.id}: {result}")
+        job_metrics.count(
+            job_name,
+            docs_scanned=len(items),
+            messages_sent=sum(1 for result in results if result is True),
+            failures=failures,
+        )
+        return results
+
+    async def _dispatch_planned(self, job_name, now, claim, send, items):
+        """
+        Like _dispatch, in two passes: `claim(item)` returns True for the items
+        that will really be sent, only their recipients get send slots, and
+        `send(item, send_at)` queues their messages.
+        """
+        claims = await self.dispatcher.run_all(partial(claim, item) for item in items)
+        claimed = []
+        failures = 0
+        for item, result in zip(items, claims):
+            if isinstance(result, Exception):
+                failures += 1
+                logger.error(f"[{job_name}] Failed to claim {item.id}: {result}")
+            elif result is True:
+                claimed.append(item)
+
+        send_at = await self.send_slots.plan(now, (item.user_id for item in claimed), stage=job_name)
+        results = await self.dispatcher.run_all(
+            partial(send, item, send_at.get(str(item.user_id))) for item in claimed
+        )
+        for item, result in zip(claimed, results):
+            if isinstance(result, Exception):
+                failures += 1
+                logger.error(f"[{job_name}] Failed to process {item.id}: {result}")
+        job_metrics.count(
+            job_name,
+            docs_scanned=len(items),
+            messages_sent=sum(1 for result in results if result is True),
+            failures=failures,
+        )
+        return results
+
     async def frequent_task(self):
         """Task that runs every 10 seconds"""
         try:
@@ -161,18 +428,18 @@ class BotScheduler:
         except Exception as e:
             print(f"Frequent task failed: {e}")
 
-    async def send_morning_notifications(self):
+    async def send_morning_notifications(self, now=None):
         """Send morning notifications"""
-        current_time_str = datetime.now(tz=zone_info).strftime("%H:%M")
+        current_time = now or datetime.now(tz=zone_info)
+        current_time_str = current_time.strftime("%H:%M")
         print(f"DEBUG: Current time in Europe/Kyiv: {current_time_str}")
-        
-        notifications = await Notification.find(
-            {"is_active": True, "notification_type": "daily_morning_notification"}
-        ).to_list()
+        notifications = await self._due_notifications(
+            NotificationType.DAILY_MORNING_NOTIFICATION, current_time
+        )
 
         print(f"DEBUG: Found {len(notifications)} morning notifications")
         
-        for notification in notifications:
+        async def claim(notification):
             logger.debug(f"Processing notification for {notification.user_id}")
             
             # notification_time в БД - це київський час для відправки
@@ -181,10 +448,8 @@ class BotScheduler:
             
             print(f"DEBUG: User {notification.user_id} - Kyiv time in DB: {notification_time}, User local time: {user_time_display}, current Kyiv: {current_time_str}")
             
-            if not notification.system_data:
-                notification.system_data = {}
-            await notification.save()
-            notification_last_sent_date = notification.system_data.get("last_sent_date")
+            system_data = notification.system_data or {}
+            notification_last_sent_date = system_data.get("last_sent_date")
             logger.debug(
                 f"Processing notification for {notification.user_id} at {notification_time}, last sent date: {notification_last_sent_date}"
             )
@@ -193,32 +458,34 @@ class BotScheduler:
                     notification_last_sent_date = notification_last_sent_date.date()
                 elif not isinstance(notification_last_sent_date, date):
                     notification_last_sent_date = None
-                if notification_last_sent_date == datetime.now(tz=zone_info).date():
+                if notification_last_sent_date == current_time.date():
                     logger.debug(
                         f"Skipping notification for {notification.user_id} at {notification_time}, already sent today"
                     )
-                    continue
-            
-            # Порівнюємо поточний київський час з часом з БД
-            if notification_time != current_time_str:
-                logger.debug(
-                    f"Skipping notification for {notification.user_id} - DB time {notification_time} != current {current_time_str}"
-                )
-                continue
-            logger.debug(f"Sending morning notification to {notification.user_id} (their local time: {user_time_display})")
+                    return
+            if not await claim_notification_for_today(notification, current_time):
+                logger.debug(f"Skipping notification for {notification.user_id}, already claimed today")
+                return
+            return True
+
+        async def send(notification, send_at):
+            logger.debug(f"Sending morning notification to {notification.user_id}")
             recipient = notification.user_id
 
             morning_quiz = MorningQuiz(
                 user_id=str(recipient),
             )
             logger.debug(f"Creating morning quiz for user {recipient}")
-            await morning_quiz.save()
+            await morning_quiz.insert()
             morning_quiz_id = morning_quiz.id
             logger.debug(f"Morning quiz created with ID {morning_quiz_id} for user {recipient}")
             try:
-                await self.bot.send_message(
-                    chat_id=recipient,
-                    text=await get_template("morning_quiz_intro"),
+                await enqueue_message(
+                    recipient,
+                    await get_template("morning_quiz_intro"),
+                    idempotency_key=f"morning:{notification.id}:{current_time:%Y-%m-%d}",
+                    source="send_morning_notifications",
+                    send_at=send_at,
                     reply_markup=InlineKeyboardMarkup(
                         inline_keyboard=[
                             [
@@ -230,39 +497,33 @@ class BotScheduler:
                         ]
                     ),
                 )
-                logger.debug(f"✅ Sent morning quiz to {recipient}")
-                notification.system_data["last_sent_date"] = datetime.now(tz=zone_info)
-                await notification.save()
-            except Exception as e:
-                logger.debug(f"Failed to send morning quiz to {recipient}: {e}")
+                logger.debug(f"✅ Queued morning quiz for {recipient}")
+                return True
+            except Exception:
+                await release_notification_claim(notification, current_time)
+                raise
 
-    async def send_after_training_notification(self):
+        await self._dispatch_planned("send_morning_notifications", current_time, claim, send, notifications)
+
+    async def send_after_training_notification(self, now=None):
         """Send after training notifications - works similar to daily notifications"""
         try:
-            current_time = datetime.now(tz=zone_info)
+            current_time = now or datetime.now(tz=zone_info)
             current_time_str = current_time.strftime("%H:%M")
             current_date = current_time.date()
             
             print(f"DEBUG: Checking after-training notifications at {current_time_str}")
-            
-            notifications = await Notification.find(
-                {
-                    "notification_type": "after_training_notification",
-                    "is_active": True,
-                }
-            ).to_list()
+            notifications = await self._due_notifications(
+                NotificationType.AFTER_TRAINING_NOTIFICATION, current_time
+            )
 
             print(f"DEBUG: Found {len(notifications)} after-training notifications")
 
-            for notification in notifications:
+            async def claim(notification):
                 notification_time = notification.notification_time
                 
                 print(f"DEBUG: User {notification.user_id} notification time: {notification_time}, current: {current_time_str}")
                 
-                # Check if notification time matches current time
-                if notification_time != current_time_str:
-                    continue
-                
                 # Initialize system_data if not exists
                 if not notification.system_data:
                     notification.system_data = {}
@@ -271,7 +532,7 @@ class BotScheduler:
                 scheduled_date_str = notification.system_data.get("scheduled_date")
                 if not scheduled_date_str:
                     print(f"No scheduled_date for notification {notification.id}")
-                    continue
+                    return
                     
                 from datetime import date
                 scheduled_date = date.fromisoformat(scheduled_date_str)
@@ -279,34 +540,39 @@ class BotScheduler:
                 # Only send if today is the scheduled date
                 if scheduled_date != current_date:
                     print(f"Notification {notification.id} scheduled for {scheduled_date}, today is {current_date}")
-                    continue
+                    return
                     
                 # Check if already sent today
                 if notification.system_data.get("sent", False):
                     print(f"Notification {notification.id} already sent")
-                    continue
+                    return
                 
                 # Verify training session exists and is completed
                 training_session_id = notification.system_data.get("training_session_id")
                 if not training_session_id:
                     print(f"No training session ID for notification {notification.id}")
-                    continue
+                    return
                     
                 training_session = await TrainingSession.get(training_session_id)
                 if not training_session:
                     print(f"Training session {training_session_id} not found, deactivating notification")
-                    notification.is_active = False
-                    await notification.save()
-                    continue
+                    await notification.set({Notification.is_active: False})
+                    return
                     
                 if not training_session.completed:
                     print(f"Training session {training_session_id} is not completed, skipping notification")
-                    continue
-                    
-                # Send the notification
-                await self.bot.send_message(
-                    chat_id=notification.user_id,
-                    text=await get_template("after_training_quiz_intro"),
+                    return
+                return True
+
+            async def send(notification, send_at):
+                training_session_id = notification.system_data.get("training_session_id")
+                # Queue the notification
+                await enqueue_message(
+                    notification.user_id,
+                    await get_template("after_training_quiz_intro"),
+                    idempotency_key=f"after_training:{notification.id}",
+                    source="send_after_training_notification",
+                    send_at=send_at,
                     reply_markup=InlineKeyboardMarkup(
                         inline_keyboard=[
                             [
@@ -320,16 +586,21 @@ class BotScheduler:
                     parse_mode="HTML",
                 )
                 
-                # Delete the notification after sending (one-time use)
+                # Delete the notification after queueing (one-time use)
                 await notification.delete()
                 
-                print(f"✅ Sent and deleted after-training notification to {notification.user_id}")
+                print(f"✅ Queued and deleted after-training notification for {notification.user_id}")
+                return True
+
+            await self._dispatch_planned(
+                "send_after_training_notification", current_time, claim, send, notifications
+            )
 
         except Exception as e:
             print(f"Failed to send after training notification: {e}")
 
-    async def send_too_long_training_notification(self):
-        now_utc = datetime.now(ZoneInfo("Europe/Kyiv"))
+    async def send_too_long_training_notification(self, now=None):
+        now_utc = now or datetime.now(ZoneInfo("Europe/Kyiv"))
         cutoff = now_utc - timedelta(hours=1)  # Змінено з hours=1 на minutes=5 для тестування
 
         sessions = await TrainingSession.find(
@@ -337,22 +608,27 @@ class BotScheduler:
             TrainingSession.training_warning_message_sent != True,
             TrainingSession.training_started_at <= cutoff,
         ).to_list()
+        sessions = [session for session in sessions if self.membership.owns(session.user_id)]
 
-        for session in sessions:
+        async def process(session):
             try:
-                await self.bot.send_message(
-                    chat_id=session.user_id,
-                    text=await get_template("too_long_training_notification"),
+                await enqueue_message(
+                    session.user_id,
+                    await get_template("too_long_training_notification"),
+                    idempotency_key=f"too_long_training:{session.id}",
+                    source="send_too_long_training_notification",
                 )
-                session.training_warning_message_sent = True
-                await session.save()
+                await session.set({TrainingSession.training_warning_message_sent: True})
                 print(
-                    f"Sent warning for training session {session.id} to {session.user_id}"
+                    f"Queued warning for training session {session.id} to {session.user_id}"
                 )
+                return True
             except Exception as e:
                 print(f"Failed to send warning for session {session.id}: {e}")
 
-    async def send_custom_notifications(self):
+        await self._dispatch("send_too_long_training_notification", process, sessions)
+
+    async def send_custom_notifications(self, now=None):
         """Custom notification example:
                     {
           "_id": {
@@ -372,192 +648,247 @@ class BotScheduler:
         }
         """
         try:
-            notifications = await Notification.find(
-                {
-                    "notification_type": "custom_notification",
-                    "is_active": True,
-                }
-            ).to_list()
-
-            for notification in notifications:
-                current_time = datetime.now(tz=zone_info).strftime("%H:%M")
-                if not notification.system_data:
-                    notification.system_data = {}
-                    await notification.save()
-                last_sent_date = notification.system_data.get("last_sent_date")
-                if (
-                    last_sent_date
-                    and last_sent_date.date() == datetime.now(tz=zone_info).date()
-                ):
-                    print(
-                        f"Skipping custom notification for {notification.user_id} at {notification.notification_time}, already sent today"
-                    )
-                    continue
-                if notification.notification_time != current_time:
-                    print(
-                        f"Skipping custom notification for {notification.user_id} at {notification.notification_time}, current time is {current_time}"
-                    )
-                    continue
-
-                if not notification.custom_notification_cron:
-                    print(f"No cron expression for notification {notification.id}")
-                    continue
+            now = now or datetime.now(tz=zone_info)
+            notifications = await self._due_notifications(
+                NotificationType.CUSTOM_NOTIFICATION, now, {"next_fire_at": {"$lte": now}}
+            )
 
-                cron_expr = notification.custom_notification_cron
-                now = datetime.now(tz=zone_info)
+            horizon = now - timedelta(minutes=settings.SCHEDULER_CATCHUP_MINUTES)
 
-                cron = croniter(cron_expr, now)
-                prev_time = cron.get_prev(datetime)
+            async def claim(notification):
+                next_fire_at = next_cron_fire_at(notification.custom_notification_cron, now)
+                if next_fire_at is None:
+                    print(f"Invalid cron expression for notification {notification.id}: {notification.custom_notification_cron}")
+                    await notification.set({Notification.next_fire_at: None})
+                    return
 
-                if prev_time.replace(second=0, microsecond=0) == now.replace(
-                    second=0, microsecond=0
-                ):
-                    await self.bot.send_message(
-                        chat_id=notification.user_id,
-                        text=notification.custom_notification_text,
+                due_at = notification.next_fire_at
+                if due_at.tzinfo is None:
+                    due_at = due_at.replace(tzinfo=timezone.utc)
+                if due_at < horizon:
+                    print(
+                        f"Skipping custom notification for {notification.user_id}, fire time {due_at} is beyond the catch-up window"
                     )
+                    await notification.set({Notification.next_fire_at: next_fire_at})
+                    return
 
-                    notification.system_data = {
-                        "last_sent_date": datetime.now(tz=zone_info).date(),
-                    }
-                    await notification.save()
-
-                    if getattr(notification, "custom_notification_execute_once", False):
-                        notification.is_active = False
-                        await notification.save()
-                else:
+                if not await claim_notification_for_today(notification, now):
                     print(
-                        f"Skipping custom notification for {notification.user_id} at {notification.notification_time}, cron does not match"
+                        f"Skipping custom notification for {notification.user_id}, already claimed today"
+                    )
+                    await notification.set({Notification.next_fire_at: next_fire_at})
+                    return
+                return True
+
+            async def send(notification, send_at):
+                next_fire_at = next_cron_fire_at(notification.custom_notification_cron, now)
+                try:
+                    await enqueue_message(
+                        notification.user_id,
+                        notification.custom_notification_text,
+                        idempotency_key=f"custom:{notification.id}:{now:%Y-%m-%dT%H:%M}",
+                        source="send_custom_notifications",
+                        send_at=send_at,
                     )
+                except Exception:
+                    await release_notification_claim(notification, now)
+                    raise
+
+                changes = {Notification.next_fire_at: next_fire_at}
+                if getattr(notification, "custom_notification_execute_once", False):
+                    changes[Notification.is_active] = False
+                await notification.set(changes)
                 print(f"✅ Sent custom notification to {notification.user_id}")
+                return True
+
+            await self._dispatch_planned("send_custom_notifications", now, claim, send, notifications)
 
         except Exception as e:
             print(f"Failed to send custom notifications: {e}")
 
-    async def send_scheduled_training_deliveries(self):
+    async def send_scheduled_training_deliveries(self, now=None):
         """Deliver scheduled trainings with preview and update user training data."""
-        now = datetime.now(tz=zone_info)
-        pending = await ScheduledTrainingDelivery.find(
-            {
-                "status": ScheduledTrainingStatus.PENDING,
-                "send_at": {"$lte": now},
-            }
-        ).to_list()
+        now = now or datetime.now(tz=zone_info)
+        lease = timedelta(seconds=settings.SCHEDULED_TRAINING_LEASE_SECONDS)
+
+        # Claim every due delivery up front so overlapping ticks or another
+        # instance can't pick the same rows, then process them in parallel.
+        # Deliveries still in progress here are skipped even if their lease
+        # ran out while waiting for a preview.
+        claimed = []
+        while True:
+            skip_ids = self._deliveries_in_flight | self._preview_tasks.keys()
+            scheduled = await claim_scheduled_delivery(now, lease, skip_ids)
+            if scheduled is None:
+                break
+            self._deliveries_in_flight.add(scheduled.id)
+            claimed.append(scheduled)
+
+        if not claimed:
+            return
+
+        await self._dispatch(
+            "send_scheduled_training_deliveries",
+            partial(self._process_scheduled_delivery, now=now),
+            claimed,
+        )
+
+    async def _process_scheduled_delivery(self, scheduled, now):
+        try:
+            return await self._deliver_scheduled_training(scheduled, now)
+        except Exception as e:
+            await self._mark_delivery_failed(scheduled, str(e), now)
+            print(f"Failed to send scheduled training to {scheduled.user_id}: {e}")
+        finally:
+            self._deliveries_in_flight.discard(scheduled.id)
+
+    def _generate_preview_in_background(self, scheduled, file_path):
+        """
+        Generate a missing preview outside the tick and the send dispatcher, so
+        slow generations don't hold up other sends; the delivery stays claimed
+        and is sent once its preview is ready.
+        """
+        task = asyncio.create_task(
+            self._generate_scheduled_preview(scheduled, file_path),
+            name=f"scheduled-training-preview-{scheduled.id}",
+        )
+        self._preview_tasks[scheduled.id] = task
+        task.add_done_callback(lambda _: self._preview_tasks.pop(scheduled.id, None))
+
+    async def _generate_scheduled_preview(self, scheduled, file_path):
+        # The lease may run out while waiting for the semaphore and OpenAI, so
+        # it is renewed around the generation; a lost lease means another
+        # instance owns the delivery now and this one drops it.
+        lease = timedelta(seconds=settings.SCHEDULED_TRAINING_LEASE_SECONDS)
+        try:
+            async with self._preview_semaphore:
+                if not await renew_scheduled_delivery_lease(scheduled, datetime.now(tz=zone_info), lease):
+                    logger.warning(f"Lost the lease on scheduled training {scheduled.id} before its preview")
+                    return
+                pdf_bytes = await asyncio.to_thread(file_path.read_bytes)
+                preview_html = await generate_training_preview_from_pdf(pdf_bytes)
+            if not preview_html:
+                raise ValueError("empty preview")
+            if not await renew_scheduled_delivery_lease(scheduled, datetime.now(tz=zone_info), lease):
+                logger.warning(f"Lost the lease on scheduled training {scheduled.id} during its preview")
+                return
+        except Exception as e:
+            await self._mark_delivery_failed(
+                scheduled, f"Не вдалося згенерувати превʼю: {e}", datetime.now(tz=zone_info)
+            )
+            return
 
-        if not pending:
+        scheduled.training_preview = preview_html
+        await ScheduledTrainingDelivery.get_motor_collection().update_one(
+            _held_lease(scheduled), {"$set": {"training_preview": preview_html}}
+        )
+        await self._dispatch(
+            "send_scheduled_training_deliveries",
+            partial(self._process_scheduled_delivery, now=datetime.now(tz=zone_info)),
+            [scheduled],
+        )
+
+    async def _deliver_scheduled_training(self, scheduled, now):
+        lease = timedelta(seconds=settings.SCHEDULED_TRAINING_LEASE_SECONDS)
+        if not await renew_scheduled_delivery_lease(scheduled, datetime.now(tz=zone_info), lease):
+            logger.warning(f"Lost the lease on scheduled training {scheduled.id}, another instance delivers it")
+            return
+        user = await User.find_one(User.telegram_id == scheduled.user_id)
+        if not user:
+            await self._mark_delivery_failed(scheduled, "User not found", now)
             return
 
-        for scheduled in pending:
-            try:
-                user = await User.find_one(User.telegram_id == scheduled.user_id)
-                if not user:
-                    scheduled.status = ScheduledTrainingStatus.FAILED
-                    scheduled.error_message = "User not found"
-                    scheduled.sent_at = now
-                    await scheduled.save()
-                    continue
-
-                file_url = scheduled.training_file_url or user.training_file_url
-                preview_html = scheduled.training_preview or user.training_preview
-                filename = scheduled.training_filename
-
-                if not file_url:
-                    scheduled.status = ScheduledTrainingStatus.FAILED
-                    scheduled.error_message = "No training file URL to send"
-                    scheduled.sent_at = now
-                    await scheduled.save()
-                    continue
-
-                # Generate preview on-the-fly if missing
-                if not preview_html:
-                    file_parts = Path(file_url.lstrip("/")).parts
-                    base_dir = Path(__file__).resolve().parents[1]
-                    files_dir = base_dir / "internal_files"
-                    if len(file_parts) >= 3 and file_parts[0] == "files":
-                        file_path = files_dir / Path(*file_parts[1:])
-                    else:
-                        file_path = files_dir / str(user.telegram_id) / Path(file_url).name
-
-                    if not file_path.exists():
-                        scheduled.status = ScheduledTrainingStatus.FAILED
-                        scheduled.error_message = f"Файл не знайдено: {file_path}"
-                        scheduled.sent_at = now
-                        await scheduled.save()
-                        continue
+        file_url = scheduled.training_file_url or user.training_file_url
+        preview_html = scheduled.training_preview
+        if not preview_html:
+            current_preview = await get_training_preview(user.telegram_id)
+            preview_html = current_preview.preview if current_preview else None
+        filename = scheduled.training_filename
 
-                    try:
-                        pdf_bytes = file_path.read_bytes()
-                        preview_html = await generate_training_preview_from_pdf(pdf_bytes)
-                    except Exception as e:
-                        scheduled.status = ScheduledTrainingStatus.FAILED
-                        scheduled.error_message = f"Не вдалося згенерувати превʼю: {e}"
-                        scheduled.sent_at = now
-                        await scheduled.save()
-                        continue
-
-                # Apply training to the user (with possibly regenerated preview)
-                user.training_file_url = file_url
-                user.training_preview = preview_html
-                user.training_preview_generated_at = now
-                user.training_preview_error = None
-
-                history_entry = TrainingFileHistory(
-                    filename=filename or (file_url.split("/")[-1] if file_url else "training.pdf"),
-                    sent_at=now,
-                    file_url=file_url,
-                )
-                if not user.training_file_history:
-                    user.training_file_history = []
-                user.training_file_history.append(history_entry)
-                await user.save()
-
-                keyboard = InlineKeyboardMarkup(
-                    inline_keyboard=[
-                        [
-                            InlineKeyboardButton(
-                                text="Підглянути, що там 🫣",
-                                callback_data="preview_training",
-                            )
-                        ]
-                    ]
-                )
+        if not file_url:
+            await self._mark_delivery_failed(scheduled, "No training file URL to send", now)
+            return
 
-                await self.bot.send_message(
-                    chat_id=int(scheduled.user_id),
-                    text="🎉 Ура! Тренер запланував нову програму!",
-                    reply_markup=keyboard,
-                    disable_web_page_preview=True,
-                )
+        # Generate the preview in the background if missing; delivered afterwards
+        if not preview_html:
+            file_parts = Path(file_url.lstrip("/")).parts
+            base_dir = Path(__file__).resolve().parents[1]
+            files_dir = base_dir / "internal_files"
+            if len(file_parts) >= 3 and file_parts[0] == "files":
+                file_path = files_dir / Path(*file_parts[1:])
+            else:
+                file_path = files_dir / str(user.telegram_id) / Path(file_url).name
+
+            if not file_path.exists():
+                await self._mark_delivery_failed(scheduled, f"Файл не знайдено: {file_path}", now)
+                return
+
+            self._generate_preview_in_background(scheduled, file_path)
+            return
 
-                scheduled.status = ScheduledTrainingStatus.SENT
-                scheduled.sent_at = now
-                scheduled.error_message = None
-                scheduled.training_preview = preview_html
-                await scheduled.save()
+        # Apply training to the user (with possibly regenerated preview)
+        await user.set({User.training_file_url: file_url})
+        await set_training_preview(user.telegram_id, preview_html, generated_at=now)
+        await add_training_file_history(
+            user.telegram_id,
+            filename or (file_url.split("/")[-1] if file_url else "training.pdf"),
+            file_url,
+            sent_at=now,
+        )
 
-            except Exception as e:
-                scheduled.status = ScheduledTrainingStatus.FAILED
-                scheduled.error_message = str(e)
-                scheduled.sent_at = now
-                await scheduled.save()
-                print(f"Failed to send scheduled training to {scheduled.user_id}: {e}")
+        keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(
+                        text="Підглянути, що там 🫣",
+                        callback_data="preview_training",
+                    )
+                ]
+            ]
+        )
+
+        await enqueue_message(
+            scheduled.user_id,
+            "🎉 Ура! Тренер запланував нову програму!",
+            idempotency_key=f"scheduled_training:{scheduled.id}",
+            reply_markup=keyboard,
+            disable_web_page_preview=True,
+            source="send_scheduled_training_deliveries",
+        )
 
-    async def send_gym_reminder_notifications(self):
+        finished = await finish_scheduled_delivery(
+            scheduled,
+            {
+                "status": ScheduledTrainingStatus.SENT.value,
+                "sent_at": now,
+                "locked_until": None,
+                "error_message": None,
+                "training_preview": preview_html,
+            },
+        )
+        if not finished:
+            logger.warning(f"Scheduled training {scheduled.id} was taken over before it was marked sent")
+        return True
+
+    async def _mark_delivery_failed(self, scheduled, error_message, now):
+        job_metrics.count("send_scheduled_training_deliveries", failures=1)
+        await finish_scheduled_delivery(
+            scheduled,
+            {
+                "status": ScheduledTrainingStatus.FAILED.value,
+                "locked_until": None,
+                "error_message": error_message,
+                "sent_at": now,
+            },
+        )
+
+    async def send_gym_reminder_notifications(self, now=None):
         try:
-            current_time = datetime.now(tz=zone_info)
+            current_time = now or datetime.now(tz=zone_info)
             current_time_str = current_time.strftime("%H:%M")
-            notifications = await Notification.find(
-                {
-                    "is_active": True,
-                }
-            ).to_list()
-
-            notifications = await Notification.find(
-                {
-                    "notification_type": "gym_reminder_notification",
-                    "is_active": True,
-                }
-            ).to_list()
+            notifications = await self._due_notifications(
+                NotificationType.GYM_REMINDER_NOTIFICATION, current_time
+            )
             logger.debug(f"[GYM_REMINDER] Found {len(notifications)} gym reminder notifications")
 
             logger.debug(
@@ -570,20 +901,40 @@ class BotScheduler:
                 },
             )
 
-            for notification in notifications:
-                notification_time = notification.notification_time
-                if notification_time != current_time_str:
-                    logger.debug(
-                        "[GYM_REMINDER] Skipping gym reminder due to time mismatch",
-                        extra={
-                            "context": {
-                                "user_id": notification.user_id,
-                                "scheduled_time": notification_time,
-                                "current_time": current_time_str,
-                            }
+            local_date = current_time.date()
+            start_local = datetime.combine(local_date, datetime.min.time(), tzinfo=zone_info)
+            end_local = start_local + timedelta(days=1)
+            start_utc = start_local.astimezone(ZoneInfo("UTC"))
+            end_utc = end_local.astimezone(ZoneInfo("UTC"))
+
+            # One query for all due reminders: users who already trained today get no reminder
+            users_with_session = set()
+            if notifications:
+                users_with_session = set(
+                    await TrainingSession.distinct(
+                        "user_id",
+                        {
+                            "user_id": {"$in": list({str(n.user_id) for n in notifications})},
+                            "$or": [
+                                {"training_started_at": {"$gte": start_utc, "$lt": end_utc}},
+                                {"training_ended_at": {"$gte": start_utc, "$lt": end_utc}},
+                            ],
                         },
                     )
-                    continue
+                )
+            logger.debug(
+                "[GYM_REMINDER] Computed reminder window",
+                extra={
+                    "context": {
+                        "start_utc": start_utc.isoformat(),
+                        "end_utc": end_utc.isoformat(),
+                        "users_with_session": len(users_with_session),
+                    }
+                },
+            )
+
+            async def claim(notification):
+                notification_time = notification.notification_time
                 
                 logger.debug(
                     "[GYM_REMINDER] Processing gym reminder",
@@ -594,60 +945,19 @@ class BotScheduler:
                         }
                     },
                 )
-                local_date = current_time.date()
-                start_local = datetime.combine(local_date, datetime.min.time(), tzinfo=zone_info)
-                end_local = start_local + timedelta(days=1)
-                start_utc = start_local.astimezone(ZoneInfo("UTC"))
-                end_utc = end_local.astimezone(ZoneInfo("UTC"))
-                logger.debug(
-                    "[GYM_REMINDER] Computed reminder window",
-                    extra={
-                        "context": {
-                            "user_id": notification.user_id,
-                            "start_local": start_local.isoformat(),
-                            "end_local": end_local.isoformat(),
-                            "start_utc": start_utc.isoformat(),
-                            "end_utc": end_utc.isoformat(),
-                        }
-                    },
-                )
-
-                existing_session = await TrainingSession.find_one(
-                    {
-                        "user_id": str(notification.user_id),
-                        "$or": [
-                            {"training_started_at": {"$gte": start_utc, "$lt": end_utc}},
-                            {"training_ended_at": {"$gte": start_utc, "$lt": end_utc}},
-                        ],
-                    }
-                )
 
-                if existing_session is not None:
+                if str(notification.user_id) in users_with_session:
                     logger.debug(
                         "[GYM_REMINDER] Skipping gym reminder because session exists",
                         extra={
                             "context": {
                                 "user_id": notification.user_id,
-                                "session_id": existing_session.id,
                             }
                         },
                     )
-                    continue
+                    return
             
-                if not notification.system_data:
-                    notification.system_data = {}
-                    await notification.save()
-                    logger.debug(
-                        "[GYM_REMINDER] Initialized system_data for notification",
-                        extra={
-                            "context": {
-                                "notification_id": notification.id,
-                                "user_id": notification.user_id,
-                            }
-                        },
-                    )
-                    
-                last_sent_date = notification.system_data.get("last_sent_date")
+                last_sent_date = (notification.system_data or {}).get("last_sent_date")
                 if last_sent_date is not None:
                     try:
                         last_date = last_sent_date.date()
@@ -684,8 +994,17 @@ class BotScheduler:
                             }
                         },
                     )
-                    continue
+                    return
                 
+                if not await claim_notification_for_today(notification, current_time):
+                    logger.debug(
+                        "[GYM_REMINDER] Skipping gym reminder claimed by another tick",
+                        extra={"context": {"user_id": notification.user_id}},
+                    )
+                    return
+                return True
+
+            async def send(notification, send_at):
                 # Відправляємо нагадування
                 logger.info(
                     "[GYM_REMINDER] Sending gym reminder",
@@ -696,73 +1015,127 @@ class BotScheduler:
                         }
                     },
                 )
-                await self.bot.send_message(
-                    chat_id=notification.user_id,
-                    text=await get_template("gym_reminder_notification_text"),
-                )
+                try:
+                    await enqueue_message(
+                        notification.user_id,
+                        await get_template("gym_reminder_notification_text"),
+                        idempotency_key=f"gym_reminder:{notification.id}",
+                        source="send_gym_reminder_notifications",
+                        send_at=send_at,
+                    )
+                except Exception:
+                    await release_notification_claim(notification, current_time)
+                    raise
                 
                 await notification.delete()
                 
                 logger.info(
-                    "[GYM_REMINDER] Gym reminder sent and notification deleted",
+                    "[GYM_REMINDER] Gym reminder queued and notification deleted",
                     extra={
                         "context": {
                             "user_id": notification.user_id,
-                            "notification_time": notification_time,
+                            "notification_time": notification.notification_time,
                         }
                     },
                 )
+                return True
+
+            await self._dispatch_planned(
+                "send_gym_reminder_notifications", current_time, claim, send, notifications
+            )
 
         except Exception:
             logger.exception("Failed to send gym reminder notifications")
 
 
     async def update_payment_days(self):
+        """Decrement payed_days_left for all paying users in one server-side update."""
+        run_date = datetime.now(tz=zone_info).date().isoformat()
+        run = PaymentDaysRun(run_date=run_date)
         try:
-            users = await User.find(
+            await run.insert()
+        except DuplicateKeyError:
+            # A run that failed can be taken over by the next attempt
+            raw = await PaymentDaysRun.get_motor_collection().find_one_and_update(
+                {"run_date": run_date, "error": {"$ne": None}, "finished_at": None},
+                {"$set": {"error": None, "started_at": datetime.now(tz=zone_info)}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if raw is None:
+                print(f"Payment days already updated for {run_date}, skipping")
+                return
+            run = PaymentDaysRun.model_validate(raw)
+            print(f"Retrying the failed payment days update for {run_date}")
+
+        try:
+            # Users counted by a failed attempt of the same day are skipped
+            result = await User.find(
                 {
                     "payed_days_left": {"$gt": 0},
                     "paused_payment": False,
+                    "payed_days_updated_on": {"$ne": run_date},
+                }
+            ).update_many(
+                {
+                    "$inc": {"payed_days_left": -1},
+                    "$set": {"payed_days_updated_on": run_date},
                 }
-            ).to_list()
-            for user in users:
-                user.payed_days_left -= 1
-                await user.save()
+            )
+            await run.set(
+                {
+                    PaymentDaysRun.finished_at: datetime.now(tz=zone_info),
+                    PaymentDaysRun.users_updated: result.modified_count,
+                }
+            )
+            print(f"Decremented payment days for {result.modified_count} users")
 
         except Exception as e:
+            await run.set({PaymentDaysRun.error: str(e)})
             print(f"Failed to process payment change: {e}")
 
     async def check_unpaid_users(self):
+        """Send the admin one digest of users whose paid period ends today, tomorrow or in a week."""
+        if not self.membership.is_leader:
+            # One digest per day: only the leader builds it and pauses expired users
+            return
         try:
             users = await User.find(
                 {
-                    "payed_days_left": {"$gte": 0},
+                    "payed_days_left": {"$in": list(PAYMENT_REMINDER_MESSAGES)},
                     "paused_payment": False,
                 }
-            ).to_list()
-            for user in users:
-                if user.payed_days_left == 0:
-                    await self.bot.send_message(
-                        chat_id=ADMIN_CHAT_ID,
-                        text=f'#Payments У користувача <a href="tg://user?id={user.telegram_id}"> {user.full_name} @{user.telegram_username} ({user.telegram_id})</a> закінчився платний період.',
-                    )
-                    user.paused_payment = True
-                    await user.save()
-                    print(f"Notified user {user.id} about subscription expiration")
-                
-                if user.payed_days_left == 7:
-                    await self.bot.send_message(
-                        chat_id=ADMIN_CHAT_ID,
-                        text=f"#Payments У користувача <a href=\"tg://user?id={user.telegram_id}\"> {user.full_name} @{user.telegram_username} ({user.telegram_id})</a> залишився 1 тиждень платного періоду.",
-                    )
-                    print(f"Notified user {user.id} about 7 days left")
-
-                if user.payed_days_left == 1:
-                    await self.bot.send_message(
-                        chat_id=ADMIN_CHAT_ID,
-                        text=f"#Payments У користувача <a href=\"tg://user?id={user.telegram_id}\"> {user.full_name} @{user.telegram_username} ({user.telegram_id})</a> залишився 1 день платного періоду.",
-                    )
-                    print(f"Notified user {user.id} about 1 day left")
+            ).project(UserPaymentStatus).to_list()
+            job_metrics.count("check_unpaid_users", docs_scanned=len(users))
+            if not users:
+                return
+
+            lines = ["#Payments"]
+            for days_left, message in PAYMENT_REMINDER_MESSAGES.items():
+                for user in users:
+                    if user.payed_days_left == days_left:
+                        lines.append(
+                            f'У користувача <a href="tg://user?id={user.telegram_id}"> {user.full_name} @{user.telegram_username} ({user.telegram_id})</a> {message}'
+                        )
+
+            run_date = datetime.now(tz=zone_info).date().isoformat()
+            for part, text in enumerate(split_message_lines(lines)):
+                await enqueue_message(
+                    ADMIN_CHAT_ID,
+                    text,
+                    idempotency_key=f"unpaid_users:{run_date}:{part}",
+                    source="check_unpaid_users",
+                )
+                job_metrics.count("check_unpaid_users", messages_sent=1)
+
+            # Pause only once the admin is sure to hear about it: paused users
+            # drop out of the query, so a failed enqueue above is retried
+            # with them still listed
+            expired_ids = [user.telegram_id for user in users if user.payed_days_left == 0]
+            if expired_ids:
+                await User.find({"telegram_id": {"$in": expired_ids}}).update_many(
+                    {"$set": {"paused_payment": True}}
+                )
+            print(f"Queued payment digest for {len(users)} users ({len(expired_ids)} expired)")
 
         except Exception as e:
             print(f"Failed to check unpaid users: {e}")
@@ -771,6 +1144,10 @@ class BotScheduler:
         """Gracefully shutdown the scheduler"""
         if self._running and self.scheduler.running:
             self.scheduler.shutdown(wait=True)
+            self.dispatcher.stop()
+            self.outbox.stop()
+            self.schedule_index.stop()
+            self.membership.stop()
             self._running = False
             
             # Stop statistics scheduler
@@ -781,3 +1158,35 @@ class BotScheduler:
     def is_running(self):
         """Check if scheduler is running"""
         return self._running and self.scheduler.running
+
+    def get_scheduler_status(self) -> dict:
+        """Jobs, last tick timings and per-job metrics of the bot scheduler"""
+        if not self.is_running():
+            return {"status": "stopped", "jobs": []}
+
+        metrics = job_metrics.snapshot()
+        jobs_info = []
+        for job in self.scheduler.get_jobs():
+            next_run = job.next_run_time
+            jobs_info.append({
+                "id": job.id,
+                "name": job.name,
+                "next_run": next_run.isoformat() if next_run else None,
+                "trigger": str(job.trigger),
+                "metrics": metrics.get(job.id),
+            })
+
+        return {
+            "status": "running",
+            "jobs": jobs_info,
+            "last_tick": self.last_tick,
+            "stages": {name: metrics.get(name) for name in self.tick_stages()},
+            "outbox": metrics.get("outbox"),
+            "dispatcher_pending": self.dispatcher.pending(),
+            "send_slots": self.send_slots.status(),
+            "send_lanes_waiting": telegram_rate_limiter.global_bucket.waiting(),
+            "preview_generations": len(self._preview_tasks),
+            "schedule_index": self.schedule_index.status(),
+            "membership": self.membership.status(),
+            "statistics": statistics_scheduler.get_scheduler_status(),
+        }
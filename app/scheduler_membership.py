@@ -0,0 +1,127 @@
+"""
+Membership of bot workers sharing scheduler work.
+
+Every BotScheduler instance keeps a lease document in `scheduler_members`
+alive. Live members are sorted by member_id; a worker's position in that list
+is its shard, and it only schedules users whose stable hash falls into it.
+The first member is the leader and runs the once-per-day jobs. When a worker
+stops renewing its lease, the others see it expire and rebalance.
+
+Sharding only spreads work: every send is still claimed atomically, so
+overlapping ownership while membership changes can't produce duplicates.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from app.config import settings
+from app.db.models import SchedulerMember
+
+logger = logging.getLogger(__name__)
+
+
+def user_shard(user_id, shard_count: int) -> int:
+    """Stable shard of a user, the same in every process and across restarts."""
+    return zlib.crc32(str(user_id).encode()) % shard_count
+
+
+class SchedulerMembership:
+    def __init__(
+        self,
+        lease_seconds: int = settings.SCHEDULER_MEMBER_LEASE_SECONDS,
+        on_rebalance: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self.member_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease = timedelta(seconds=lease_seconds)
+        self.on_rebalance = on_rebalance
+        self.members: List[str] = [self.member_id]
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def shard_index(self) -> int:
+        return self.members.index(self.member_id) if self.member_id in self.members else 0
+
+    @property
+    def shard_count(self) -> int:
+        return max(1, len(self.members))
+
+    @property
+    def is_leader(self) -> bool:
+        return self.shard_index == 0
+
+    def owns(self, user_id) -> bool:
+        if self.shard_count == 1:
+            return True
+        return user_shard(user_id, self.shard_count) == self.shard_index
+
+    async def heartbeat(self) -> bool:
+        """Renew our lease and refresh the member list; returns True if the list changed."""
+        now = datetime.now(timezone.utc)
+        await SchedulerMember.get_motor_collection().update_one(
+            {"member_id": self.member_id},
+            {
+                "$set": {"lease_until": now + self.lease, "hostname": socket.gethostname()},
+                "$setOnInsert": {"started_at": now},
+            },
+            upsert=True,
+        )
+        live = await SchedulerMember.get_motor_collection().distinct(
+            "member_id", {"lease_until": {"$gt": now}}
+        )
+        members = sorted(set(live) | {self.member_id})
+        if members == self.members:
+            return False
+        logger.info(
+            f"[MEMBERSHIP] {len(members)} scheduler worker(s), "
+            f"{self.member_id} is shard {members.index(self.member_id)}"
+        )
+        self.members = members
+        return True
+
+    async def start(self) -> None:
+        await self.heartbeat()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="scheduler-membership")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Leave explicitly so the others rebalance without waiting for the lease
+        try:
+            asyncio.get_running_loop().create_task(self.leave())
+        except RuntimeError:
+            pass
+
+    async def leave(self) -> None:
+        try:
+            await SchedulerMember.get_motor_collection().delete_one({"member_id": self.member_id})
+        except Exception:
+            logger.exception("[MEMBERSHIP] Failed to remove member lease")
+
+    async def _run(self) -> None:
+        interval = self.lease.total_seconds() / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                changed = await self.heartbeat()
+                if changed and self.on_rebalance is not None:
+                    await self.on_rebalance()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("[MEMBERSHIP] Heartbeat failed")
+
+    def status(self) -> dict:
+        return {
+            "member_id": self.member_id,
+            "shard_index": self.shard_index,
+            "shard_count": self.shard_count,
+            "is_leader": self.is_leader,
+            "members": self.members,
+        }
@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
-from app.db.models import User, MorningQuiz, TrainingSession, UserStatistics, PeriodType
+from app.db.models import MorningQuiz, TrainingSession, UserStatistics, PeriodType
+from app.db.user_queries import find_user_ids
 import logging
 
 logger = logging.getLogger(__name__)
@@ -446,15 +447,15 @@ class StatisticsGenerator:
     
     async def generate_statistics_for_all_users(self, period_type: PeriodType, use_previous_period: bool = True) -> List[UserStatistics]:
         """Генерує статистику для всіх активних користувачів"""
-        active_users = await User.find({"is_active": True}).to_list()
+        active_user_ids = await find_user_ids({"is_active": True})
         generated_statistics = []
         
-        for user in active_users:
+        for user_id in active_user_ids:
             try:
-                stats = await self.generate_user_statistics(user.telegram_id, period_type, use_previous_period)
+                stats = await self.generate_user_statistics(user_id, period_type, use_previous_period)
                 generated_statistics.append(stats)
             except Exception as e:
-                print(f"Помилка при генерації статистики для користувача {user.telegram_id}: {e}")
+                print(f"Помилка при генерації статистики для користувача {user_id}: {e}")
                 continue
         
         return generated_statistics
@@ -2,7 +2,10 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from app.statistics import StatisticsGenerator
 from app.statistics_image_generator import StatisticsImageGenerator
-from app.db.models import PeriodType
+from app.db.models import KYIV_TZ, PeriodType, StatisticsBroadcastRun
+from app.utils.job_metrics import job_metrics
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,6 +24,7 @@ class StatisticsScheduler:
         self.stats_generator = StatisticsGenerator()
         self.image_generator = StatisticsImageGenerator()
         self.bot = None
+        job_metrics.listen(self.scheduler)
     
     @staticmethod
     def is_fourth_monday_or_later():
@@ -152,8 +156,41 @@ class StatisticsScheduler:
             self.scheduler.shutdown()
             logger.info("Планувальник статистики зупинено")
     
+    @staticmethod
+    async def _claim_broadcast(period_type: PeriodType, period_key: str):
+        """
+        Атомарно займає розсилку за період: запис вставляє лише один воркер,
+        решта отримують None. Так статистика розсилається рівно раз, навіть
+        якщо кілька воркерів одночасно (або жоден) вважають себе лідером.
+        """
+        run = StatisticsBroadcastRun(period_type=period_type, period_key=period_key)
+        try:
+            await run.insert()
+        except DuplicateKeyError:
+            logger.info(f"Статистику {period_type.value} за {period_key} вже розсилає інший воркер")
+            return None
+        return run
+
+    @staticmethod
+    async def _finish_broadcast(run, results=None, error=None):
+        """Записує результат розсилки в її запис"""
+        if error is not None:
+            await run.set({StatisticsBroadcastRun.error: str(error)})
+            return
+        await run.set({
+            StatisticsBroadcastRun.finished_at: datetime.now(tz=KYIV_TZ),
+            StatisticsBroadcastRun.messages_sent: results["success"] if results else 0,
+            StatisticsBroadcastRun.failures: results["failed"] if results else 0,
+        })
+
     async def send_weekly_statistics_to_users(self):
         """Відправка тижневої статистики всім користувачам"""
+        today = datetime.now(tz=KYIV_TZ).date()
+        week_start = today - timedelta(days=today.weekday())
+        run = await self._claim_broadcast(PeriodType.WEEKLY, week_start.isoformat())
+        if run is None:
+            return
+
         async def _send_task():
             try:
                 from app.statistics_sender import send_weekly_statistics_to_all_users
@@ -161,41 +198,63 @@ class StatisticsScheduler:
                 if self.bot:
                     logger.info("Початок відправки тижневої статистики користувачам")
                     results = await send_weekly_statistics_to_all_users(self.bot)
+                    job_metrics.count(
+                        "send_weekly_statistics",
+                        docs_scanned=results["total"],
+                        messages_sent=results["success"],
+                        failures=results["failed"],
+                    )
                     logger.info(f"Результати відправки тижневої статистики: успішно - {results['success']}, невдало - {results['failed']}")
+                    await self._finish_broadcast(run, results)
                 else:
                     logger.warning("Не можливо відправити тижневу статистику - бот не ініціалізовано")
+                    await self._finish_broadcast(run, error="bot is not initialized")
                     
             except Exception as e:
                 logger.error(f"Помилка при відправці тижневої статистики: {e}")
-        
-        import asyncio
-        asyncio.create_task(_send_task())
-        logger.info("Задача відправки тижневої статистики запущена у фоновому режимі")
+                await self._finish_broadcast(run, error=e)
+                raise
+
+        # Чекаємо на розсилку, щоб метрики бачили її тривалість і помилки
+        await _send_task()
     
     async def send_monthly_statistics_to_users(self):
         """Відправка місячної статистики всім користувачам"""
+        if not self.is_fourth_monday_or_later():
+            logger.info("Не 4-й понеділок місяця, місячна статистика не відправляється")
+            return
+
+        month = datetime.now(tz=KYIV_TZ).strftime("%Y-%m")
+        run = await self._claim_broadcast(PeriodType.MONTHLY, month)
+        if run is None:
+            return
+
         async def _send_task():
             try:
-                if not self.is_fourth_monday_or_later():
-                    logger.info("Не 4-й понеділок місяця, місячна статистика не відправляється")
-                    return
-                    
                 from app.statistics_sender import send_monthly_statistics_to_all_users
                 
                 if self.bot:
                     logger.info("Початок відправки місячної статистики користувачам")
                     results = await send_monthly_statistics_to_all_users(self.bot)
+                    job_metrics.count(
+                        "send_monthly_statistics",
+                        docs_scanned=results["total"],
+                        messages_sent=results["success"],
+                        failures=results["failed"],
+                    )
                     logger.info(f"Результати відправки місячної статистики: успішно - {results['success']}, невдало - {results['failed']}")
+                    await self._finish_broadcast(run, results)
                 else:
                     logger.warning("Не можливо відправити місячну статистику - бот не ініціалізовано")
+                    await self._finish_broadcast(run, error="bot is not initialized")
                     
             except Exception as e:
                 logger.error(f"Помилка при відправці місячної статистики: {e}")
-        
-        # Запускаємо в окремій задачі, щоб не блокувати scheduler
-        import asyncio
-        asyncio.create_task(_send_task())
-        logger.info("Задача відправки місячної статистики запущена у фоновому режимі")
+                await self._finish_broadcast(run, error=e)
+                raise
+
+        # Чекаємо на розсилку, щоб метрики бачили її тривалість і помилки
+        await _send_task()
 
     def get_scheduler_status(self) -> dict:
         """Отримання статусу планувальника"""
@@ -204,6 +263,7 @@ class StatisticsScheduler:
         if not self.scheduler.running:
             return {"status": "stopped", "jobs": []}
         
+        metrics = job_metrics.snapshot()
         jobs_info = []
         for job in self.scheduler.get_jobs():
             next_run = job.next_run_time
@@ -211,7 +271,8 @@ class StatisticsScheduler:
                 "id": job.id,
                 "name": job.name,
                 "next_run": next_run.isoformat() if next_run else None,
-                "trigger": str(job.trigger)
+                "trigger": str(job.trigger),
+                "metrics": metrics.get(job.id),
             })
         
         # Додаємо інформацію про поточний статус 4-го понеділка
@@ -2,7 +2,6 @@
 Модуль для відправлення статистики користувачам через Telegram
 """
 import logging
-import asyncio
 import os
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -11,8 +10,10 @@ from typing import List, Optional
 from aiogram import Bot
 from aiogram.types import InputFile, FSInputFile
 
-from app.db.models import User, UserStatistics, PeriodType
+from app.db.models import UserStatistics, PeriodType
+from app.db.user_queries import find_user_summaries
 from app.statistics_web_generator import WebStatisticsGenerator
+from app.utils.rate_limiter import SendPriority, send_priority
 
 logger = logging.getLogger(__name__)
 
@@ -118,7 +119,6 @@ class StatisticsSender:
                                 text=part,
                                 parse_mode="HTML"
                             )
-                        await asyncio.sleep(0.5)  # Невелика затримка між повідомленнями
                 else:
                     await self.bot.send_message(
                         chat_id=user_id,
@@ -211,7 +211,6 @@ class StatisticsSender:
                                 text=part,
                                 parse_mode="HTML"
                             )
-                        await asyncio.sleep(0.5)  # Невелика затримка між повідомленнями
                 else:
                     await self.bot.send_message(
                         chat_id=user_id,
@@ -248,7 +247,7 @@ class StatisticsSender:
         
         try:
             # Отримуємо всіх користувачів
-            users = await User.find().to_list()
+            users = await find_user_summaries()
             results["total"] = len(users)
             
             # Генеруємо статистику для всіх користувачів
@@ -289,9 +288,6 @@ class StatisticsSender:
                     results["failed"] += 1
                     results["errors"].append(f"Помилка при відправці користувачу {user.telegram_id}: {str(e)}")
                     logger.error(f"Помилка при відправці статистики користувачу {user.telegram_id}: {e}")
-                    
-                # Затримка між повідомленнями для уникнення обмежень Telegram
-                await asyncio.sleep(0.5)
                 
             return results
             
@@ -359,10 +355,12 @@ class StatisticsSender:
 async def send_weekly_statistics_to_all_users(bot):
     """Відправляє тижневу статистику всім користувачам"""
     sender = StatisticsSender(bot)
-    return await sender.send_statistics_to_all_users(PeriodType.WEEKLY)
+    with send_priority(SendPriority.BROADCAST):
+        return await sender.send_statistics_to_all_users(PeriodType.WEEKLY)
 
 
 async def send_monthly_statistics_to_all_users(bot):
     """Відправляє місячну статистику всім користувачам"""
     sender = StatisticsSender(bot)
-    return await sender.send_statistics_to_all_users(PeriodType.MONTHLY)
+    with send_priority(SendPriority.BROADCAST):
+        return await sender.send_statistics_to_all_users(PeriodType.MONTHLY)
@@ -1,11 +1,111 @@
 from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
 from aiogram.types import Message, CallbackQuery
-from typing import Dict, Any, Callable, Awaitable
+from typing import Dict, Any, Callable, Awaitable, List, Optional
+from app.config import settings
 from app.db.models import ConversationTransition
+import asyncio
 import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationTransitionWriter:
+    """
+    Buffers ConversationTransition records and writes them with insert_many
+    from a background task, every `batch_size` records or `flush_interval`
+    seconds, so tracking adds no database round trip to a handler.
+
+    The buffer is bounded: if MongoDB is unreachable for long, the oldest
+    records are dropped rather than growing memory. stop() writes what is left.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.CONVERSATION_TRANSITION_BATCH_SIZE,
+        flush_interval: float = settings.CONVERSATION_TRANSITION_FLUSH_SECONDS,
+        max_pending: int = settings.CONVERSATION_TRANSITION_MAX_PENDING,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: List[ConversationTransition] = []
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.dropped = 0
+
+    def add(self, transition: ConversationTransition) -> None:
+        self._pending.append(transition)
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped += overflow
+        if len(self._pending) >= self.batch_size and self._flush_requested is not None:
+            self._flush_requested.set()
+
+    async def flush(self) -> None:
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            await ConversationTransition.insert_many(batch)
+        except Exception:
+            logger.exception(f"Failed to write {len(batch)} conversation transitions, will retry")
+            # Keep them for the next flush, ahead of newer records and within the bound
+            self._pending = (batch + self._pending)[-self.max_pending:]
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._flush_requested = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="conversation-transition-writer")
+
+    async def stop(self) -> None:
+        """Let a running flush finish instead of cancelling it mid-write, then write the rest."""
+        if self._task is not None:
+            self._stopping = True
+            self._flush_requested.set()
+            await self._task
+            self._task = None
+        self._flush_requested = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+
+conversation_transition_writer = ConversationTransitionWriter()
+
+
+class StateRecordingContext(FSMContext):
+    """
+    FSMContext handed to the handler in place of aiogram's one; remembers the
+    state the handler sets (clear() goes through set_state too), so the
+    middleware knows the new state without reading it back from storage.
+    """
+
+    def __init__(self, context: FSMContext, current_state: Optional[str]):
+        super().__init__(storage=context.storage, key=context.key)
+        self.current_state = current_state
+
+    async def set_state(self, state: Optional[State | str] = None) -> None:
+        await super().set_state(state)
+        self.current_state = state.state if isinstance(state, State) else state
 
 
 class ConversationTrackerMiddleware(BaseMiddleware):
+    def __init__(self, writer: ConversationTransitionWriter = conversation_transition_writer):
+        self.writer = writer
+
     async def __call__(
         self,
         handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
@@ -14,11 +114,15 @@ class ConversationTrackerMiddleware(BaseMiddleware):
     ) -> Any:
         state = data.get("state")
         if state:
-            prev_state = await state.get_state()
+            # Read by aiogram's FSM middleware before the handler runs
+            prev_state = data["raw_state"] if "raw_state" in data else await state.get_state()
+            state = data["state"] = StateRecordingContext(state, prev_state)
             result = await handler(event, data)
-            current_state = await state.get_state()
+            if not prev_state:
+                return result
+            current_state = state.current_state
 
-            if prev_state and current_state:
+            if current_state:
                 prev_group = prev_state.split(":")[0]
                 current_group = current_state.split(":")[0]
 
@@ -28,13 +132,14 @@ class ConversationTrackerMiddleware(BaseMiddleware):
                         if hasattr(event, "from_user")
                         else event.message.from_user.id
                     )
-                    conversation_transition = ConversationTransition(
-                        user_id=str(user_id),
-                        from_flow=prev_group,
-                        to_flow=current_group,
-                        timestamp=datetime.datetime.now(),
+                    self.writer.add(
+                        ConversationTransition(
+                            user_id=str(user_id),
+                            from_flow=prev_group,
+                            to_flow=current_group,
+                            timestamp=datetime.datetime.now(),
+                        )
                     )
-                    await conversation_transition.insert()
 
             return result
         return await handler(event, data)
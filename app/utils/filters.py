@@ -1,12 +1,18 @@
 from aiogram.filters import Filter
 from aiogram.types import Message, CallbackQuery
-from typing import Union
-from app.db.models import User
+from typing import Optional, Union
+from app.db.models import UserContext
+from app.utils.user_context import load_user_context
 
 
 class VerifiedUserFilter(Filter):
-    async def __call__(self, message: Union[Message, CallbackQuery]) -> bool:
-        user = await User.find_one(User.telegram_id == str(message.from_user.id))
+    async def __call__(
+        self,
+        message: Union[Message, CallbackQuery],
+        user_context: Optional[UserContext] = None,
+    ) -> bool:
+        # user_context is injected by LoadUserMiddleware
+        user = user_context or await load_user_context(message.from_user.id)
         if user and user.is_active:
             return True
         return False
@@ -0,0 +1,182 @@
+"""
+In-process metrics for APScheduler jobs and tick stages.
+
+Runs, start lag, durations and failures are recorded from scheduler events;
+jobs report documents scanned and messages sent themselves. Everything is
+exposed in Prometheus text format via start_metrics_server() and as a dict
+for get_scheduler_status().
+"""
+import logging
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobStats:
+    runs: int = 0
+    failures: int = 0
+    skipped_overlap: int = 0
+    missed: int = 0
+    docs_scanned: int = 0
+    messages_sent: int = 0
+    last_lag_seconds: Optional[float] = None
+    max_lag_seconds: float = 0.0
+    last_duration_seconds: Optional[float] = None
+    max_duration_seconds: float = 0.0
+    total_duration_seconds: float = 0.0
+    interval_seconds: Optional[float] = None
+    last_run_at: Optional[str] = None
+
+
+class JobMetrics:
+    def __init__(self):
+        self._jobs: Dict[str, JobStats] = {}
+        self._started: Dict[str, float] = {}
+
+    def _stats(self, job_id: str) -> JobStats:
+        stats = self._jobs.get(job_id)
+        if stats is None:
+            stats = self._jobs[job_id] = JobStats()
+        return stats
+
+    def set_interval(self, job_id: str, seconds: float) -> None:
+        self._stats(job_id).interval_seconds = seconds
+
+    def count(
+        self,
+        job_id: str,
+        *,
+        docs_scanned: int = 0,
+        messages_sent: int = 0,
+        failures: int = 0,
+    ) -> None:
+        stats = self._stats(job_id)
+        stats.docs_scanned += docs_scanned
+        stats.messages_sent += messages_sent
+        stats.failures += failures
+
+    def observe_run(
+        self,
+        job_id: str,
+        duration: float,
+        *,
+        lag: Optional[float] = None,
+        failed: bool = False,
+    ) -> None:
+        stats = self._stats(job_id)
+        stats.runs += 1
+        stats.failures += int(failed)
+        stats.last_duration_seconds = duration
+        stats.max_duration_seconds = max(stats.max_duration_seconds, duration)
+        stats.total_duration_seconds += duration
+        stats.last_run_at = datetime.now(timezone.utc).isoformat()
+        if lag is not None:
+            stats.last_lag_seconds = lag
+            stats.max_lag_seconds = max(stats.max_lag_seconds, lag)
+
+    def listen(self, scheduler) -> None:
+        """Record run, lag, duration, failure, overlap and misfire events of an APScheduler."""
+        scheduler.add_listener(
+            self._on_event,
+            EVENT_JOB_SUBMITTED
+            | EVENT_JOB_EXECUTED
+            | EVENT_JOB_ERROR
+            | EVENT_JOB_MAX_INSTANCES
+            | EVENT_JOB_MISSED,
+        )
+
+    def _on_event(self, event) -> None:
+        try:
+            if event.code == EVENT_JOB_SUBMITTED:
+                self._started[event.job_id] = time.perf_counter()
+            elif event.code in (EVENT_JOB_EXECUTED, EVENT_JOB_ERROR):
+                started = self._started.pop(event.job_id, None)
+                duration = time.perf_counter() - started if started is not None else 0.0
+                lag = None
+                if event.scheduled_run_time is not None:
+                    finished = datetime.now(event.scheduled_run_time.tzinfo)
+                    lag = max(0.0, (finished - event.scheduled_run_time).total_seconds() - duration)
+                self.observe_run(
+                    event.job_id,
+                    duration,
+                    lag=lag,
+                    failed=event.code == EVENT_JOB_ERROR,
+                )
+            elif event.code == EVENT_JOB_MAX_INSTANCES:
+                self._stats(event.job_id).skipped_overlap += 1
+            elif event.code == EVENT_JOB_MISSED:
+                self._stats(event.job_id).missed += 1
+        except Exception:
+            logger.exception("Failed to record scheduler job metrics")
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {job_id: asdict(stats) for job_id, stats in self._jobs.items()}
+
+    def render_prometheus(self) -> str:
+        metrics = [
+            ("scheduler_job_runs_total", "counter", "Completed runs", "runs"),
+            ("scheduler_job_failures_total", "counter", "Runs that raised", "failures"),
+            ("scheduler_job_skipped_overlap_total", "counter", "Runs skipped because the previous one was still running", "skipped_overlap"),
+            ("scheduler_job_missed_total", "counter", "Runs missed past their misfire grace time", "missed"),
+            ("scheduler_job_docs_scanned_total", "counter", "Documents loaded by the job", "docs_scanned"),
+            ("scheduler_job_messages_sent_total", "counter", "Messages sent or queued by the job", "messages_sent"),
+            ("scheduler_job_duration_seconds_total", "counter", "Total run time", "total_duration_seconds"),
+            ("scheduler_job_last_duration_seconds", "gauge", "Duration of the last run", "last_duration_seconds"),
+            ("scheduler_job_max_duration_seconds", "gauge", "Longest run seen", "max_duration_seconds"),
+            ("scheduler_job_last_lag_seconds", "gauge", "Scheduled vs actual start of the last run", "last_lag_seconds"),
+            ("scheduler_job_max_lag_seconds", "gauge", "Largest start lag seen", "max_lag_seconds"),
+            ("scheduler_job_interval_seconds", "gauge", "Configured interval between runs", "interval_seconds"),
+        ]
+        lines = []
+        for name, kind, help_text, field in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for job_id, stats in sorted(self._jobs.items()):
+                value = getattr(stats, field)
+                if value is None:
+                    continue
+                lines.append(f'{name}{{job="{job_id}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+job_metrics = JobMetrics()
+
+
+async def start_metrics_server(
+    port: int,
+    host: str = "0.0.0.0",
+    status_provider: Optional[Callable[[], dict]] = None,
+):
+    """
+    Serve job_metrics on http://host:port/metrics in Prometheus text format,
+    and status_provider() as JSON on /status if given.
+    """
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=job_metrics.render_prometheus(), content_type="text/plain")
+
+    async def handle_status(request):
+        return web.json_response(status_provider())
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    if status_provider is not None:
+        app.router.add_get("/status", handle_status)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Scheduler metrics available on http://{host}:{port}/metrics")
+    return runner
@@ -1,7 +1,8 @@
 import datetime
 from typing import Optional
 
-from app.db.models import MorningQuiz, Notification, User
+from app.db.models import MorningQuiz, Notification, UserContext
+from app.utils.user_context import load_user_context
 
 
 def validate_transform_time(time_str: str) -> Optional[float]:
@@ -52,7 +53,7 @@ async def create_gym_reminder_notification(
         }).delete()
 
         # gym_time приходить в часовому поясі користувача (з ранкового опитування)
-        user = await User.find_one(User.telegram_id == user_id)
+        user = await load_user_context(user_id)
         timezone_offset = user.timezone_offset or 0 if user else 0
 
         # Конвертуємо час користувача в київський час
@@ -96,8 +97,9 @@ async def get_active_morning_quiz_for_today(
     user_id: str,
     *,
     is_test: Optional[bool] = None,
+    user: Optional[UserContext] = None,
 ) -> Optional[MorningQuiz]:
-    user = await User.find_one(User.telegram_id == str(user_id))
+    user = user or await load_user_context(user_id)
     timezone_offset = user.timezone_offset or 0 if user else 0
     now = datetime.datetime.now()
     user_now = now + datetime.timedelta(hours=timezone_offset)
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Dict, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def last_used(self) -> float:
+        return self._updated
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def set_rate(self, rate: float) -> None:
+        """Change the rate, with capacity following it (one second's worth of tokens)."""
+        self._refill()
+        self.rate = rate
+        self.capacity = rate
+        self._tokens = min(self._tokens, self.capacity)
+
+    def pause(self, seconds: float) -> None:
+        """Drain the bucket so nothing is let through for the next `seconds`."""
+        self._refill()
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class SendPriority(IntEnum):
+    """Lanes of outgoing traffic, most urgent first."""
+    INTERACTIVE = 0  # handler replies to a user who is waiting
+    SCHEDULED = 1  # reminders and other outbox messages
+    BROADCAST = 2  # statistics and other mass sends
+
+
+_send_priority: ContextVar[SendPriority] = ContextVar("send_priority", default=SendPriority.INTERACTIVE)
+
+
+@contextmanager
+def send_priority(priority: SendPriority):
+    """Send every request made inside the block (and tasks it starts) in the given lane."""
+    token = _send_priority.set(priority)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class PriorityTokenBucket(TokenBucket):
+    """
+    Token bucket shared by priority lanes.
+
+    A lane only takes a token when no more urgent lane is waiting. While
+    interactive requests were seen in the last `interactive_window` seconds,
+    lower lanes also leave a share of the bucket untouched, so bulk sends
+    back off while users are chatting and resume at full rate afterwards.
+    """
+
+    # Share of capacity kept free for more urgent lanes while users are active
+    RESERVED_SHARE = {
+        SendPriority.INTERACTIVE: 0.0,
+        SendPriority.SCHEDULED: 0.3,
+        SendPriority.BROADCAST: 0.6,
+    }
+
+    def __init__(self, rate: float, capacity: float, interactive_window: float):
+        super().__init__(rate, capacity)
+        self.interactive_window = interactive_window
+        self._waiting = {priority: 0 for priority in SendPriority}
+        self._last_interactive = float("-inf")
+
+    def _reserved(self, priority: SendPriority) -> float:
+        if time.monotonic() - self._last_interactive > self.interactive_window:
+            return 0.0
+        return self.capacity * self.RESERVED_SHARE[priority]
+
+    def _may_take(self, priority: SendPriority) -> bool:
+        if any(self._waiting[p] for p in SendPriority if p < priority):
+            return False
+        return self._tokens >= 1 + self._reserved(priority)
+
+    async def acquire(self, priority: SendPriority = SendPriority.INTERACTIVE) -> None:
+        if priority == SendPriority.INTERACTIVE:
+            self._last_interactive = time.monotonic()
+        self._waiting[priority] += 1
+        try:
+            while True:
+                self._refill()
+                if self._may_take(priority):
+                    self._tokens -= 1
+                    return
+                # Wake up when the next token is due; lanes blocked by a more
+                # urgent one re-check after one token's worth of time
+                await asyncio.sleep(max(1 - self._tokens, 1) / self.rate)
+        finally:
+            self._waiting[priority] -= 1
+
+    def waiting(self) -> Dict[str, int]:
+        return {priority.name.lower(): count for priority, count in self._waiting.items()}
+
+
+class TelegramRateLimiter(BaseRequestMiddleware):
+    """
+    Bot session middleware that keeps outgoing requests within Telegram limits.
+
+    Every request addressed to a chat takes a token from the per-chat bucket
+    (1 msg/s for private chats, 20 msg/min for groups) and from the global
+    bucket (30 msg/s). The global bucket is shared by priority lanes set with
+    send_priority(), so replies overtake reminders and broadcasts.
+    TelegramRetryAfter pauses the chat's bucket, or the global bucket for
+    requests not addressed to a chat, and retries.
+    """
+
+    # Idle per-chat buckets are dropped once the map grows past this size
+    MAX_CHAT_BUCKETS = 10000
+    CHAT_BUCKET_IDLE_SECONDS = 60
+
+    def __init__(
+        self,
+        global_rate: float = settings.TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = settings.TELEGRAM_CHAT_RATE,
+        chat_burst: float = settings.TELEGRAM_CHAT_BURST,
+        group_rate: float = settings.TELEGRAM_GROUP_RATE_PER_MINUTE / 60,
+        max_retries: int = settings.TELEGRAM_MAX_RETRIES,
+        interactive_window: float = settings.TELEGRAM_INTERACTIVE_WINDOW_SECONDS,
+    ):
+        self.global_bucket = PriorityTokenBucket(global_rate, global_rate, interactive_window)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+
+    @staticmethod
+    def _is_group(chat_id: Union[int, str]) -> bool:
+        return str(chat_id).startswith("-")
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self._chat_buckets.get(key)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self._prune_chat_buckets()
+            if self._is_group(chat_id):
+                bucket = TokenBucket(self.group_rate, 1)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[key] = bucket
+        return bucket
+
+    def _prune_chat_buckets(self) -> None:
+        cutoff = time.monotonic() - self.CHAT_BUCKET_IDLE_SECONDS
+        for key in [k for k, b in self._chat_buckets.items() if b.last_used < cutoff]:
+            del self._chat_buckets[key]
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        priority = _send_priority.get()
+        attempt = 0
+        while True:
+            if chat_id is not None:
+                await self._chat_bucket(chat_id).acquire()
+                await self.global_bucket.acquire(priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(
+                    f"Telegram flood control on {type(method).__name__} (chat {chat_id}), "
+                    f"retrying in {e.retry_after}s (attempt {attempt}/{self.max_retries})"
+                )
+                if chat_id is not None:
+                    # Flood control on one chat must not hold up every other chat
+                    self._chat_bucket(chat_id).pause(e.retry_after)
+                else:
+                    self.global_bucket.pause(e.retry_after)
+                    await asyncio.sleep(e.retry_after)
+
+
+# Shared by every Bot in the process so all senders draw from one budget
+telegram_rate_limiter = TelegramRateLimiter()
+
+
+def install_rate_limiter(bot: Bot) -> Bot:
+    bot.session.middleware(telegram_rate_limiter)
+    return bot
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SendJob = Callable[[], Awaitable[Any]]
+
+
+class SendDispatcher:
+    """
+    Fixed pool of asyncio workers that run submitted send jobs concurrently.
+
+    Scheduler jobs submit one job per recipient instead of awaiting sends one
+    after another, so a tick is bound by the rate limiter rather than by
+    Telegram round-trip latency.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"send-dispatcher-{i}")
+            for i in range(self.workers)
+        ]
+
+    def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def submit(self, job: SendJob) -> asyncio.Future:
+        """Queue a job; the returned future resolves with its result or exception."""
+        if not self._tasks:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((job, future))
+        return future
+
+    async def run_all(self, jobs: Iterable[SendJob]) -> list:
+        """Submit all jobs and wait for them; exceptions are returned, not raised."""
+        futures = [self.submit(job) for job in jobs]
+        if not futures:
+            return []
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    async def _worker(self) -> None:
+        while True:
+            job, future = await self._queue.get()
+            try:
+                result = await job()
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
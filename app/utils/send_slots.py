@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SendSlotPlanner:
+    """
+    Spreads the sends due in one minute over a bounded window.
+
+    Users pick round times, so a single minute can hold thousands of
+    reminders. Each one gets a send_at offset from the start of its minute at
+    `rate` messages per second. Offsets are capped at `max_spread_seconds`;
+    anything beyond that is left for the rate limiter to drain and shows up
+    in the plan as overflow.
+
+    Stages of one tick share a minute bucket. The tick opens a round naming
+    the stages that plan; each stage submits only the recipients it actually
+    claimed, and once every stage has submitted (or finished without
+    planning) the bucket is laid out stage by stage in the round's order,
+    users within a stage ordered by a hash of their id. The layout therefore
+    doesn't depend on which stage finishes claiming first.
+    """
+
+    # Buckets remembered for status reports
+    HISTORY = 60
+
+    def __init__(
+        self,
+        rate: float = settings.SEND_SLOT_RATE,
+        max_spread_seconds: float = settings.SEND_SLOT_MAX_SPREAD_SECONDS,
+    ):
+        self.rate = rate
+        self.max_spread = max_spread_seconds
+        self._buckets: "OrderedDict[datetime, dict]" = OrderedDict()
+        self._rounds: Dict[datetime, dict] = {}
+
+    @staticmethod
+    def _order_key(user_id) -> tuple:
+        return zlib.crc32(str(user_id).encode()), str(user_id)
+
+    @staticmethod
+    def _bucket_start(due_at: datetime) -> datetime:
+        return due_at.replace(second=0, microsecond=0)
+
+    def open_round(self, due_at: datetime, stages: Iterable[str]) -> None:
+        """Make the listed stages' plans for this minute wait for each other."""
+        self._rounds[self._bucket_start(due_at)] = {
+            "stages": list(stages),
+            "submitted": {},
+            "future": asyncio.get_running_loop().create_future(),
+        }
+
+    def close_stage(self, due_at: datetime, stage: str) -> None:
+        """The stage finished; if it never planned, the round stops waiting for it."""
+        bucket_start = self._bucket_start(due_at)
+        round_ = self._rounds.get(bucket_start)
+        if round_ is not None and stage in round_["stages"] and stage not in round_["submitted"]:
+            round_["submitted"][stage] = []
+            self._maybe_lay_out(bucket_start)
+
+    async def plan(self, due_at: datetime, user_ids: Iterable, stage: Optional[str] = None) -> Dict[str, datetime]:
+        """send_at per user id for the claimed sends of `stage` due in the minute of `due_at`."""
+        ordered = sorted({str(u) for u in user_ids}, key=self._order_key)
+        bucket_start = self._bucket_start(due_at)
+        round_ = self._rounds.get(bucket_start)
+        if round_ is None or stage not in round_["stages"] or stage in round_["submitted"]:
+            return self._assign(bucket_start, ordered)
+
+        round_["submitted"][stage] = ordered
+        future = round_["future"]
+        self._maybe_lay_out(bucket_start)
+        return (await future)[stage]
+
+    def _maybe_lay_out(self, bucket_start: datetime) -> None:
+        round_ = self._rounds[bucket_start]
+        if len(round_["submitted"]) < len(round_["stages"]):
+            return
+        del self._rounds[bucket_start]
+        slots = {
+            stage: self._assign(bucket_start, round_["submitted"][stage])
+            for stage in round_["stages"]
+        }
+        round_["future"].set_result(slots)
+
+    def _assign(self, bucket_start: datetime, ordered: List[str]) -> Dict[str, datetime]:
+        if not ordered:
+            return {}
+
+        bucket = self._buckets.get(bucket_start)
+        if bucket is None:
+            bucket = self._buckets[bucket_start] = {"planned": 0, "overflow": 0}
+            while len(self._buckets) > self.HISTORY:
+                self._buckets.popitem(last=False)
+
+        slots = {}
+        for user_id in ordered:
+            offset = bucket["planned"] / self.rate
+            if offset > self.max_spread:
+                offset = self.max_spread
+                bucket["overflow"] += 1
+            slots[user_id] = bucket_start + timedelta(seconds=offset)
+            bucket["planned"] += 1
+
+        report = self.drain_report(bucket_start)
+        logger.info(
+            f"[SEND_SLOTS] {bucket_start:%H:%M}: {report['planned']} sends, "
+            f"expected drain {report['drain_seconds']:.0f}s "
+            f"(window {self.max_spread:.0f}s, overflow {report['overflow']})"
+        )
+        return slots
+
+    def drain_report(self, bucket_start: datetime) -> dict:
+        bucket = self._buckets[bucket_start]
+        return {
+            "planned": bucket["planned"],
+            "overflow": bucket["overflow"],
+            "drain_seconds": round(bucket["planned"] / self.rate, 1),
+        }
+
+    def status(self) -> dict:
+        """Expected drain time per recent minute bucket."""
+        return {
+            bucket_start.isoformat(): self.drain_report(bucket_start)
+            for bucket_start in self._buckets
+        }
@@ -1,19 +1,150 @@
-from app.db.models import TextTemplate
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from app.config import settings
+from app.db.models import CacheVersion, TextTemplate
+
+logger = logging.getLogger(__name__)
+
+# Immutable snapshot of all templates, replaced as a whole on reload
+_template_cache: Mapping[str, str] = MappingProxyType({})
+
+# Name of the CacheVersion document bumped on every template edit
+TEMPLATE_CACHE_NAME = "text_templates"
+_cache_version = None
+_version_checked_at = float("-inf")
+_sync_loaded = False
+
+TEMPLATE_PROJECTION = {"_id": 0, "template_key": 1, "template_text": 1}
+
+
+def _set_snapshot(templates: dict) -> None:
+    global _template_cache
+    _template_cache = MappingProxyType(dict(templates))
+
+
+def _add_to_snapshot(template_key: str, template_text: str) -> None:
+    _set_snapshot({**_template_cache, template_key: template_text})
+
+
+def _write_snapshot_file(templates: dict) -> None:
+    """Keep a copy of the templates on disk for starts when Mongo is slow or down."""
+    path = settings.TEMPLATE_SNAPSHOT_PATH
+    if not path:
+        return
+    try:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(templates, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to write template snapshot {path}: {e}")
+
+
+def _read_snapshot_file() -> Optional[dict]:
+    path = settings.TEMPLATE_SNAPSHOT_PATH
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to read template snapshot {path}: {e}")
+        return None
+
+
+async def _read_cache_version() -> int:
+    current = await CacheVersion.get_motor_collection().find_one(
+        {"name": TEMPLATE_CACHE_NAME}, {"version": 1}
+    )
+    return current["version"] if current else 0
+
+
+async def _load_templates() -> tuple:
+    version = await _read_cache_version()
+    cursor = TextTemplate.get_motor_collection().find({}, TEMPLATE_PROJECTION)
+    return version, {doc["template_key"]: doc["template_text"] async for doc in cursor}
+
+
+async def preload_templates():
+    """
+    Load every template with one query into the in-memory snapshot. Gives up
+    on MongoDB after TEMPLATE_SYNC_TIMEOUT_MS and falls back to the on-disk
+    snapshot, like the sync preload; the next version check retries Mongo.
+    """
+    global _cache_version, _version_checked_at, _sync_loaded
+    try:
+        version, templates = await asyncio.wait_for(
+            _load_templates(), timeout=settings.TEMPLATE_SYNC_TIMEOUT_MS / 1000
+        )
+    except Exception as e:
+        _version_checked_at = time.monotonic()
+        if _sync_loaded:
+            logger.warning(f"Keeping loaded text templates, MongoDB unavailable: {e!r}")
+            return
+        templates = _read_snapshot_file()
+        if templates is None:
+            raise
+        logger.warning(f"Loaded text templates from snapshot, MongoDB unavailable: {e!r}")
+        _set_snapshot(templates)
+        _cache_version = None  # reload from Mongo once the version can be read
+        _sync_loaded = True
+        return
+
+    _set_snapshot(templates)
+    _cache_version = version
+    _version_checked_at = time.monotonic()
+    # Sync accessors share this snapshot instead of loading their own
+    _sync_loaded = True
+    _write_snapshot_file(templates)
+    logger.info(f"Loaded {len(templates)} text templates")
+
+
+async def _refresh_cache_version():
+    """
+    Reload the snapshot if templates were edited in another process since it
+    was loaded. The version is read at most every TEMPLATE_CACHE_CHECK_SECONDS.
+    """
+    global _version_checked_at
+    now = time.monotonic()
+    if now - _version_checked_at < settings.TEMPLATE_CACHE_CHECK_SECONDS:
+        return
+    _version_checked_at = now
+    if await _read_cache_version() != _cache_version:
+        await preload_templates()
+
+
+async def invalidate_template_cache():
+    """Reload templates in this and, within a few seconds, every other process."""
+    await CacheVersion.get_motor_collection().update_one(
+        {"name": TEMPLATE_CACHE_NAME},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now()}},
+        upsert=True,
+    )
+    await preload_templates()
 
-# Cache to store templates and reduce database calls
-_template_cache = {}
 
 async def get_template(template_key: str, default_text: str = None) -> str:
     """
-    Get text template from MongoDB or return the default text if not found.
-    Templates are cached for better performance.
+    Get text template from the in-memory snapshot or return the default text if not found.
+    Templates missing from the snapshot are looked up in MongoDB once.
     """
+    await _refresh_cache_version()
+    if template_key in _template_cache:
+        return _template_cache[template_key]
+
     # Try to get template from database
     template = await TextTemplate.find_one({"template_key": template_key})
-    
+
     if template:
         # Store in cache and return
-        _template_cache[template_key] = template.template_text
+        _add_to_snapshot(template_key, template.template_text)
         return template.template_text
     elif default_text:
         # Template not found, but we have default text
@@ -23,44 +154,74 @@ async def get_template(template_key: str, default_text: str = None) -> str:
             template_text=default_text,
             description=f"Auto-created template for {template_key}"
         ).save()
-        
+
         # Add to cache
-        _template_cache[template_key] = default_text
+        _add_to_snapshot(template_key, default_text)
         return default_text
     else:
         # No template and no default
         return f"MISSING_TEMPLATE:{template_key}"
-    
 
-def sync_get_template(template_key: str, default_text: str = None) -> str:
+
+def _sync_collection(client):
+    return client.get_database(settings.MONGODB_DB_NAME)["text_templates"]
+
+
+def _sync_client():
+    from pymongo import MongoClient
+    return MongoClient(
+        settings.MONGODB_URL or settings.mongodb_connection_string,
+        serverSelectionTimeoutMS=settings.TEMPLATE_SYNC_TIMEOUT_MS,
+    )
+
+
+def _sync_preload():
     """
-    Synchronous fetch of template from MongoDB for sync contexts.
+    Load all templates with one client and one query the first time a sync
+    accessor is used (route filters call it at import time). Falls back to
+    the on-disk snapshot if Mongo can't be reached.
     """
-    from app.db.models import TextTemplate
-    global _template_cache
+    global _sync_loaded
+    client = _sync_client()
+    try:
+        templates = {
+            doc["template_key"]: doc["template_text"]
+            for doc in _sync_collection(client).find({}, TEMPLATE_PROJECTION)
+        }
+    except Exception as e:
+        templates = _read_snapshot_file()
+        if templates is None:
+            raise
+        logger.warning(f"Loaded text templates from snapshot, MongoDB unavailable: {e}")
+    else:
+        _write_snapshot_file(templates)
+    finally:
+        client.close()
+    _set_snapshot({**templates, **_template_cache})
+    _sync_loaded = True
+
 
+def sync_get_template(template_key: str, default_text: str = None) -> str:
+    """
+    Synchronous access to the template snapshot for sync contexts.
+    """
     try:
-        from pymongo import MongoClient
-        import os
-        from dotenv import load_dotenv
-        load_dotenv()
-        mongo_url = os.getenv("MONGODB_URL")
-        client = MongoClient(mongo_url)
-        DB_NAME = os.environ.get("MONGODB_DB_NAME", "islobbot")
-        db = client.get_database(DB_NAME)
-        collection = db["text_templates"]
-        template = collection.find_one({"template_key": template_key})
-        if template and "template_text" in template:
-            _template_cache[template_key] = template["template_text"]
-            return template["template_text"]
+        if not _sync_loaded:
+            _sync_preload()
+        if template_key in _template_cache:
+            return _template_cache[template_key]
         elif default_text:
             # Insert default template for future editing
-            collection.insert_one({
-                "template_key": template_key,
-                "template_text": default_text,
-                "description": f"Auto-created template for {template_key}"
-            })
-            _template_cache[template_key] = default_text
+            client = _sync_client()
+            try:
+                _sync_collection(client).insert_one({
+                    "template_key": template_key,
+                    "template_text": default_text,
+                    "description": f"Auto-created template for {template_key}"
+                })
+            finally:
+                client.close()
+            _add_to_snapshot(template_key, default_text)
             return default_text
         else:
             return f"MISSING_TEMPLATE:{template_key}"
@@ -76,6 +237,9 @@ async def format_template(template_key: str, default_text: str = None, **kwargs)
     return template.format(**kwargs)
 
 def clear_template_cache():
-    """Clear the template cache to force reloading from database"""
-    global _template_cache
-    _template_cache = {}
+    """Drop this process's snapshot; use invalidate_template_cache() to reach other processes"""
+    global _cache_version, _version_checked_at, _sync_loaded
+    _set_snapshot({})
+    _cache_version = None
+    _version_checked_at = float("-inf")
+    _sync_loaded = False
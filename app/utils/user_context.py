@@ -0,0 +1,71 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.config import settings
+from app.db.models import User, UserContext
+
+
+class UserContextCache:
+    """
+    Short-lived process-local cache of UserContext by telegram_id.
+
+    Writes through the User document (save, set, delete...) invalidate the
+    entry via a model hook; writes from other processes, such as the web
+    app, are picked up once the entry expires.
+    """
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self, ttl_seconds: float = settings.USER_CONTEXT_TTL_SECONDS):
+        self.ttl = ttl_seconds
+        self._entries: Dict[str, Tuple[float, Optional[UserContext]]] = {}
+
+    def get(self, telegram_id: str) -> Tuple[bool, Optional[UserContext]]:
+        entry = self._entries.get(telegram_id)
+        if entry is None or entry[0] < time.monotonic():
+            return False, None
+        return True, entry[1]
+
+    def put(self, telegram_id: str, user: Optional[UserContext]) -> None:
+        if len(self._entries) >= self.MAX_ENTRIES:
+            now = time.monotonic()
+            self._entries = {k: v for k, v in self._entries.items() if v[0] >= now}
+        self._entries[telegram_id] = (time.monotonic() + self.ttl, user)
+
+    def invalidate(self, telegram_id: Optional[str]) -> None:
+        if telegram_id is not None:
+            self._entries.pop(str(telegram_id), None)
+
+
+user_context_cache = UserContextCache()
+
+
+async def load_user_context(telegram_id: Union[int, str]) -> Optional[UserContext]:
+    """UserContext of a bot user from the cache or one projected query; None if not registered."""
+    telegram_id = str(telegram_id)
+    found, user = user_context_cache.get(telegram_id)
+    if found:
+        return user
+    user = await User.find_one(User.telegram_id == telegram_id).project(UserContext)
+    user_context_cache.put(telegram_id, user)
+    return user
+
+
+class LoadUserMiddleware(BaseMiddleware):
+    """
+    Outer update middleware that loads the sender's UserContext once and
+    passes it to filters and handlers as `user_context`.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        from_user = data.get("event_from_user")
+        data["user_context"] = await load_user_context(from_user.id) if from_user else None
+        return await handler(event, data)
@@ -0,0 +1,59 @@
+"""
+Скрипт для видалення дублікатів користувачів з однаковим telegram_id,
+щоб можна було створити унікальний індекс telegram_id
+
+Залишається найстаріший документ (за created_at); поля, порожні в ньому,
+заповнюються з дублікатів. Без --apply лише показує, що буде змінено.
+"""
+import asyncio
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import settings
+
+
+async def dedupe_users(apply: bool):
+    """Злити дублікати користувачів в один документ на кожен telegram_id"""
+
+    # Підключаємось до бази даних
+    client = AsyncIOMotorClient(settings.MONGODB_URL or settings.mongodb_connection_string)
+    users = client[settings.MONGODB_DB_NAME]["users"]
+
+    duplicates = users.aggregate([
+        {"$group": {"_id": "$telegram_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ])
+
+    groups = 0
+    removed = 0
+    async for group in duplicates:
+        groups += 1
+        docs = await users.find({"_id": {"$in": group["ids"]}}).sort([("created_at", 1), ("_id", 1)]).to_list(None)
+        keep, extra = docs[0], docs[1:]
+
+        # Заповнюємо порожні поля залишеного документа значеннями з дублікатів
+        fill = {}
+        for doc in extra:
+            for field, value in doc.items():
+                if field != "_id" and keep.get(field) is None and value is not None and field not in fill:
+                    fill[field] = value
+
+        print(
+            f"telegram_id={group['_id']}: залишаємо {keep['_id']}, "
+            f"видаляємо {[doc['_id'] for doc in extra]}, заповнюємо {sorted(fill)}"
+        )
+        if apply:
+            if fill:
+                await users.update_one({"_id": keep["_id"]}, {"$set": fill})
+            await users.delete_many({"_id": {"$in": [doc["_id"] for doc in extra]}})
+        removed += len(extra)
+
+    if apply:
+        print(f"\n✅ Готово! Злито {groups} груп, видалено {removed} дублікатів")
+    else:
+        print(f"\nЗнайдено {groups} груп, {removed} дублікатів. Запустіть з --apply, щоб злити їх")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(dedupe_users(apply="--apply" in sys.argv))
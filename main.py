@@ -6,9 +6,16 @@ from app.db.database import init_db
 from aiogram.fsm.storage.mongo import MongoStorage
 from aiogram import Bot, Dispatcher
 from app.config import settings
-from app.utils.conversation_tracker_middleware import ConversationTrackerMiddleware
+from app.utils.conversation_tracker_middleware import (
+    ConversationTrackerMiddleware,
+    conversation_transition_writer,
+)
+from app.utils.user_context import LoadUserMiddleware
 from aiogram.client.default import DefaultBotProperties
 from app.scheduler import BotScheduler
+from app.utils.rate_limiter import install_rate_limiter
+from app.utils.job_metrics import start_metrics_server
+from app.utils.text_templates import preload_templates
 import logging
 import signal
 import sys
@@ -37,6 +44,7 @@ async def main():
         # Initialize database
         logging.info("Initializing database...")
         client = await init_db()
+        await preload_templates()
 
         # Setup bot storage
         storage = MongoStorage(
@@ -49,11 +57,16 @@ async def main():
         bot = Bot(
             token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML")
         )
+        install_rate_limiter(bot)
         dp = Dispatcher(storage=storage)
 
         # Add middleware
+        dp.update.outer_middleware(LoadUserMiddleware())
         dp.message.middleware(ConversationTrackerMiddleware())
         dp.callback_query.middleware(ConversationTrackerMiddleware())
+        conversation_transition_writer.start()
+        # Runs when polling stops, so buffered transitions are written before exit
+        dp.shutdown.register(conversation_transition_writer.stop)
 
         # Include routers
         from app.routers.main_router import main_router
@@ -75,6 +88,17 @@ async def main():
         bot_scheduler = BotScheduler(bot=bot, db_client=client)
         await bot_scheduler.start()
 
+        if settings.METRICS_PORT:
+            await start_metrics_server(
+                settings.METRICS_PORT,
+                status_provider=bot_scheduler.get_scheduler_status,
+            )
+
+        if not settings.BOT_POLLING_ENABLED:
+            # Scheduler-only worker: another instance polls Telegram for updates
+            logging.info("Bot polling disabled, running scheduler only...")
+            await asyncio.Event().wait()
+
         logging.info("Starting bot polling...")
 
         # Run bot polling (this will run indefinitely)
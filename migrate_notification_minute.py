@@ -0,0 +1,69 @@
+"""
+Міграційний скрипт для заповнення notification_minute та next_fire_at в існуючих сповіщеннях
+"""
+import asyncio
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from app.config import settings
+from app.db.models import (
+    KYIV_TZ,
+    Notification,
+    NotificationType,
+    next_cron_fire_at,
+    time_str_to_minute_of_day,
+)
+
+
+async def migrate_notifications():
+    """Заповнити notification_minute з notification_time та next_fire_at з cron для всіх сповіщень"""
+
+    # Підключаємось до бази даних
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+
+    # Ініціалізуємо Beanie (також створює індекс type/is_active/minute)
+    from beanie import init_beanie
+    await init_beanie(
+        database=client[settings.MONGODB_DB_NAME],
+        document_models=[Notification]
+    )
+
+    print("Починаємо міграцію сповіщень...")
+
+    collection = Notification.get_motor_collection()
+    cursor = collection.find(
+        {},
+        {
+            "notification_time": 1,
+            "notification_minute": 1,
+            "notification_type": 1,
+            "custom_notification_cron": 1,
+        },
+    )
+    cron_after = datetime.now(KYIV_TZ).replace(second=0, microsecond=0) - timedelta(seconds=1)
+
+    operations = []
+    total = 0
+    async for raw in cursor:
+        total += 1
+        changes = {}
+        minute = time_str_to_minute_of_day(raw.get("notification_time"))
+        if raw.get("notification_minute") != minute:
+            if minute is None:
+                print(f"❌ Помилка парсингу часу для сповіщення {raw['_id']}: {raw.get('notification_time')}")
+            changes["notification_minute"] = minute
+        if raw.get("notification_type") == NotificationType.CUSTOM_NOTIFICATION.value:
+            changes["next_fire_at"] = next_cron_fire_at(raw.get("custom_notification_cron"), cron_after)
+        if changes:
+            operations.append(UpdateOne({"_id": raw["_id"]}, {"$set": changes}))
+
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+
+    print(f"\n✅ Міграція завершена! Оновлено {len(operations)} сповіщень з {total}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate_notifications())
@@ -0,0 +1,91 @@
+"""
+Міграційний скрипт для перенесення training_preview та training_file_history з документів користувачів
+в окремі колекції training_previews та training_file_history
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from app.config import settings
+from app.db.models import TrainingFileHistory, TrainingPreview, User
+
+LEGACY_FIELDS = (
+    "training_preview",
+    "training_preview_generated_at",
+    "training_preview_error",
+    "training_file_history",
+)
+
+
+async def migrate_training_files():
+    """Перенести превʼю та історію файлів тренувань і видалити ці поля з користувачів"""
+
+    # Підключаємось до бази даних
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+
+    # Ініціалізуємо Beanie (також створює індекси нових колекцій)
+    from beanie import init_beanie
+    await init_beanie(
+        database=client[settings.MONGODB_DB_NAME],
+        document_models=[User, TrainingPreview, TrainingFileHistory]
+    )
+
+    print("Починаємо міграцію превʼю та історії тренувань...")
+
+    users = User.get_motor_collection()
+    previews = TrainingPreview.get_motor_collection()
+    history = TrainingFileHistory.get_motor_collection()
+
+    cursor = users.find(
+        {"$or": [{field: {"$exists": True}} for field in LEGACY_FIELDS]},
+        {"telegram_id": 1, **{field: 1 for field in LEGACY_FIELDS}},
+    )
+
+    preview_operations = []
+    history_entries = []
+    migrated_ids = []
+    async for raw in cursor:
+        user_id = raw["telegram_id"]
+        if raw.get("training_preview") or raw.get("training_preview_error"):
+            preview_operations.append(
+                UpdateOne(
+                    {"user_id": user_id},
+                    # $setOnInsert: previews already written by the new code are newer
+                    {
+                        "$setOnInsert": {
+                            "preview": raw.get("training_preview"),
+                            "generated_at": raw.get("training_preview_generated_at"),
+                            "error": raw.get("training_preview_error"),
+                        }
+                    },
+                    upsert=True,
+                )
+            )
+        for entry in raw.get("training_file_history") or []:
+            history_entries.append({
+                "user_id": user_id,
+                "filename": entry.get("filename"),
+                "sent_at": entry.get("sent_at"),
+                "file_url": entry.get("file_url"),
+            })
+        migrated_ids.append(raw["_id"])
+
+    if preview_operations:
+        await previews.bulk_write(preview_operations, ordered=False)
+    if history_entries:
+        await history.insert_many(history_entries, ordered=False)
+    if migrated_ids:
+        await users.update_many(
+            {"_id": {"$in": migrated_ids}},
+            {"$unset": {field: "" for field in LEGACY_FIELDS}},
+        )
+
+    print(
+        f"\n✅ Міграція завершена! Користувачів: {len(migrated_ids)}, "
+        f"превʼю: {len(preview_operations)}, записів історії: {len(history_entries)}"
+    )
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate_training_files())
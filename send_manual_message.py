@@ -5,6 +5,7 @@ import glob
 from aiogram import Bot
 from app.db.database import init_db
 from app.db.models import User
+from app.utils.rate_limiter import install_rate_limiter
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -70,7 +71,7 @@ async def send_message_to_user(user_id: str, message: str, parse_mode: str = "HT
         message: Текст повідомлення
         parse_mode: Режим парсингу (HTML, Markdown, None)
     """
-    bot = Bot(token=os.environ.get("BOT_TOKEN"))
+    bot = install_rate_limiter(Bot(token=os.environ.get("BOT_TOKEN")))
     
     try:
         await bot.send_message(
@@ -115,7 +116,7 @@ async def send_files_to_user(user_id: str, path: str, parse_mode: str = "HTML"):
             print("❌ Відправку скасовано")
             return 0, len(files)
     
-    bot = Bot(token=os.environ.get("BOT_TOKEN"))
+    bot = install_rate_limiter(Bot(token=os.environ.get("BOT_TOKEN")))
     success_count = 0
     
     try:
@@ -134,10 +135,6 @@ async def send_files_to_user(user_id: str, path: str, parse_mode: str = "HTML"):
                 )
                 success_count += 1
                 print(f"✅ {i}/{len(files)} - Відправлено {os.path.basename(file_path)}")
-                
-                # Невелика затримка між повідомленнями
-                if len(files) > 1:
-                    await asyncio.sleep(0.2)
                     
             except Exception as e:
                 print(f"❌ {i}/{len(files)} - Помилка відправки {os.path.basename(file_path)}: {e}")
@@ -262,7 +259,7 @@ async def send_broadcast_message(message: str, active_only: bool = True, parse_m
         print("❌ Розсилку скасовано")
         return
     
-    bot = Bot(token=os.environ.get("BOT_TOKEN"))
+    bot = install_rate_limiter(Bot(token=os.environ.get("BOT_TOKEN")))
     
     success_count = 0
     failed_count = 0
@@ -279,9 +276,6 @@ async def send_broadcast_message(message: str, active_only: bool = True, parse_m
             success_count += 1
             print(f"✅ {i}/{len(users)} - {user.full_name} ({user.telegram_id})")
             
-            # Невелика затримка між повідомленнями щоб не спамити
-            await asyncio.sleep(0.1)
-            
         except Exception as e:
             failed_count += 1
             print(f"❌ {i}/{len(users)} - {user.full_name} ({user.telegram_id}): {e}")
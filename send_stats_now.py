@@ -9,6 +9,7 @@ from aiogram import Bot
 from app.db.database import init_db
 from app.statistics_sender import send_weekly_statistics_to_all_users
 from app.config import settings
+from app.utils.rate_limiter import install_rate_limiter
 
 # Налаштовуємо логування
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -22,7 +23,7 @@ async def send_statistics_now():
     await init_db()
     
     # Ініціалізуємо бота
-    bot = Bot(token=settings.BOT_TOKEN)
+    bot = install_rate_limiter(Bot(token=settings.BOT_TOKEN))
     
     try:
         logger.info("Запускаємо відправку тижневої статистики всім користувачам...")
@@ -3,6 +3,7 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from app.db.models import TextTemplate, User
+from app.utils.text_templates import invalidate_template_cache
 from web_app.auth import get_current_user
 
 router = APIRouter(prefix="/api/bot-settings", tags=["bot settings"])
@@ -114,15 +115,8 @@ async def update_text_template(
         template.last_updated = datetime.now()
         await template.save()
         
-        # Clear template cache
-        import importlib
-        try:
-            text_templates = importlib.import_module('app.utils.text_templates')
-            if hasattr(text_templates, 'clear_template_cache'):
-                text_templates.clear_template_cache()
-        except ImportError:
-            # If the module doesn't exist, we don't need to worry
-            pass
+        # Clear template cache in the bot and web processes
+        await invalidate_template_cache()
         
         return TextTemplateResponse(
             id=str(template.id),
@@ -138,17 +132,9 @@ async def update_text_template(
 
 @router.get("/clear-template-cache")
 async def clear_cache(admin_user: User = Depends(get_admin_user)):
-    """Clear the template cache to force reloading from database"""
+    """Clear the template cache in every process to force reloading from database"""
     try:
-        import importlib
-        try:
-            text_templates = importlib.import_module('app.utils.text_templates')
-            if hasattr(text_templates, 'clear_template_cache'):
-                text_templates.clear_template_cache()
-                return {"message": "Кеш шаблонів очищено успішно"}
-            else:
-                return {"message": "Функція очищення кешу не знайдена"}
-        except ImportError:
-            return {"message": "Модуль text_templates не знайдено"}
+        await invalidate_template_cache()
+        return {"message": "Кеш шаблонів очищено успішно"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
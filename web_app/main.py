@@ -9,12 +9,20 @@ import mimetypes
 
 logger = logging.getLogger(__name__)
 from app.db.database import init_db
+from app.utils.text_templates import preload_templates
+from app.db.user_queries import find_user_summaries
+from app.db.training_files import (
+    add_training_file_history,
+    clear_training_preview,
+    get_training_file_history,
+    get_training_preview,
+    set_training_preview,
+)
 from app.db.models import (
     User,
     TrainingSession,
     MorningQuiz,
     Notification,
-    TrainingFileHistory,
     ScheduledTrainingDelivery,
     ScheduledTrainingStatus,
 )
@@ -92,6 +100,7 @@ async def log_static_requests(request: Request, call_next):
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    await preload_templates()
 
 @app.get("/debug/static-check")
 async def debug_static_check():
@@ -337,7 +346,7 @@ async def auth_telegram(
 
 @app.get("/customers", response_class=HTMLResponse)
 async def show_customers(request: Request, user: User = Depends(get_admin_user)):
-    users = await User.find_all().to_list()
+    users = await find_user_summaries()
     return templates.TemplateResponse("customers.html", {"request": request, "users": users, "current_user": user})
 
 
@@ -408,11 +417,8 @@ async def user_profile(request: Request, telegram_id: str = Query(...), user: Us
         item.id: _build_training_view_path(item.user_id, item.training_file_url)
         for item in scheduled_deliveries
     }
-    history_items = sorted(
-        user_profile.training_file_history or [],
-        key=lambda item: item.sent_at,
-        reverse=True,
-    )
+    training_preview = await get_training_preview(user_profile.telegram_id)
+    history_items = await get_training_file_history(user_profile.telegram_id)
     history_view = [
         {
             "filename": item.filename,
@@ -441,6 +447,7 @@ async def user_profile(request: Request, telegram_id: str = Query(...), user: Us
             "training_file_view_path": training_file_view_path,
             "scheduled_view_paths": scheduled_view_paths,
             "history_view": history_view,
+            "training_preview": training_preview,
         }
     )
 
@@ -469,27 +476,22 @@ async def upload_training_file(
     file_url = f"/files/{user_telegram_id}/{safe_filename}"
 
     recipient.training_file_url = file_url
-    recipient.training_preview = None
-    recipient.training_preview_generated_at = None
-    recipient.training_preview_error = None
+    await recipient.save()
 
     preview_status = None
     preview_message = None
 
     try:
         preview_text = await generate_training_preview_from_pdf(content)
-        recipient.training_preview = preview_text
-        recipient.training_preview_generated_at = datetime.now()
+        await set_training_preview(user_telegram_id, preview_text)
         preview_status = "success"
         preview_message = "Превʼю згенеровано."
     except Exception as e:
         logger.error("Failed to generate training preview for %s: %s", user_telegram_id, e, exc_info=True)
-        recipient.training_preview_error = str(e)
+        await set_training_preview(user_telegram_id, None, error=str(e))
         preview_status = "error"
         preview_message = "Не вдалося згенерувати превʼю. Перевірте PDF або ключ OpenAI."
 
-    await recipient.save()
-
     redirect_url = f"/profile?telegram_id={user_telegram_id}"
     if preview_status:
         redirect_url += f"&preview_status={preview_status}"
@@ -516,10 +518,7 @@ async def update_training_preview(
         redirect_url = f"/profile?telegram_id={telegram_id}&preview_status=error&preview_message={quote_plus('Превʼю не може бути порожнім.')}"
         return RedirectResponse(redirect_url, status_code=302)
 
-    recipient.training_preview = new_preview
-    recipient.training_preview_generated_at = datetime.now()
-    recipient.training_preview_error = None
-    await recipient.save()
+    await set_training_preview(telegram_id, new_preview)
 
     redirect_url = f"/profile?telegram_id={telegram_id}&preview_status=success&preview_message={quote_plus('Превʼю збережено.')}"
     return RedirectResponse(redirect_url, status_code=302)
@@ -562,20 +561,11 @@ async def delete_training_file(
                 e,
             )
 
-    history_entry = TrainingFileHistory(
-        filename=f"🗑️ Видалено: {filename}",
-        sent_at=datetime.now(),
-        file_url=None,
-    )
-    if not recipient.training_file_history:
-        recipient.training_file_history = []
-    recipient.training_file_history.append(history_entry)
+    await add_training_file_history(telegram_id, f"🗑️ Видалено: {filename}", None)
 
     recipient.training_file_url = None
-    recipient.training_preview = None
-    recipient.training_preview_generated_at = None
-    recipient.training_preview_error = None
     await recipient.save()
+    await clear_training_preview(telegram_id)
 
     redirect_url = (
         f"/profile?telegram_id={telegram_id}"
@@ -613,7 +603,8 @@ async def schedule_training_delivery(
     file_url = recipient.training_file_url
     filename = file_url.split("/")[-1] if file_url else None
 
-    preview_html = recipient.training_preview
+    current_preview = await get_training_preview(telegram_id)
+    preview_html = current_preview.preview if current_preview else None
     if not preview_html:
         if not filename:
             redirect_url = f"/profile?telegram_id={telegram_id}&schedule_status=error&schedule_message={quote_plus('Не знайдено файл для генерації превʼю.')}"
@@ -686,6 +677,10 @@ async def delete_scheduled_training(
         redirect_url = f"/profile?telegram_id={telegram_id}&schedule_status=error&schedule_message={quote_plus('Пендінг відправки не видаляємо — спершу скасуйте.')}"
         return RedirectResponse(redirect_url, status_code=302)
 
+    if delivery.status == ScheduledTrainingStatus.SENDING:
+        redirect_url = f"/profile?telegram_id={telegram_id}&schedule_status=error&schedule_message={quote_plus('Відправка саме виконується, спробуйте пізніше.')}"
+        return RedirectResponse(redirect_url, status_code=302)
+
     await delivery.delete()
     redirect_url = f"/profile?telegram_id={telegram_id}&schedule_status=success&schedule_message={quote_plus('Відправку видалено.')}"
     return RedirectResponse(redirect_url, status_code=302)
@@ -731,7 +726,8 @@ async def notify_training_assigned(
         raise HTTPException(status_code=404, detail="Користувача не знайдено або тренування не присвоєне")
     
     # Створюємо бота
-    bot = Bot(token=BOT_TOKEN)
+    from app.utils.rate_limiter import install_rate_limiter
+    bot = install_rate_limiter(Bot(token=BOT_TOKEN))
     
     try:
         keyboard = InlineKeyboardMarkup(
@@ -749,15 +745,7 @@ async def notify_training_assigned(
         )
 
         filename = recipient.training_file_url.split("/")[-1] if recipient.training_file_url else "training.pdf"
-        history_entry = TrainingFileHistory(
-            filename=filename,
-            sent_at=datetime.now(),
-            file_url=recipient.training_file_url
-        )
-        if not recipient.training_file_history:
-            recipient.training_file_history = []
-        recipient.training_file_history.append(history_entry)
-        await recipient.save()
+        await add_training_file_history(telegram_id, filename, recipient.training_file_url)
 
         logger.info(f"✅ Training notification sent to user {telegram_id}")
         
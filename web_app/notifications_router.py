@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import Optional, List
 from fastapi import APIRouter, HTTPException, Query, Depends, Form
 from app.db.models import Notification, NotificationType, User
+from app.db.user_queries import find_user_summaries, find_user_summary, user_summaries_by_id
 from web_app.auth import get_current_user
 from pydantic import BaseModel
 import re
@@ -119,17 +120,16 @@ async def get_user_notifications(
                 query_filter["notification_type"] = notification_type
                 
             # Отримуємо дані користувачів для додавання імен та таймзон
-            users_list = await User.find().to_list()
             users = {
-                user.telegram_id: {
+                telegram_id: {
                     "name": user.full_name,
                     "timezone_offset": user.timezone_offset,
                     "country": user.country
-                } for user in users_list
+                } for telegram_id, user in (await user_summaries_by_id()).items()
             }
         else:
             # Перевіряємо чи існує користувач
-            user = await User.find_one({"telegram_id": user_id})
+            user = await find_user_summary(user_id)
             if not user:
                 raise HTTPException(status_code=404, detail="Користувача не знайдено")
             
@@ -455,7 +455,7 @@ async def update_notification(
 async def get_all_users(admin_user: User = Depends(get_admin_user)):
     """Отримати список всіх користувачів для адміністративного інтерфейсу"""
     try:
-        users = await User.find().sort([("full_name", 1)]).to_list()
+        users = await find_user_summaries(sort=[("full_name", 1)])
         
         return [{
             "telegram_id": user.telegram_id,